@@ -73,7 +73,7 @@ INSTALLED_APPS = [
 # Middleware
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'tracker.utils.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -145,7 +145,23 @@ if USE_REDIS:
                 },
             },
             'TIMEOUT': 300,
-        }
+        },
+        # Large plain-data payloads (coin registry, long-tail quotes) as zstd-compressed msgpack instead of pickle
+        'bulk': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'bulk',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'SERIALIZER': 'django_redis.serializers.msgpack.MSGPackSerializer',
+                'COMPRESSOR': 'django_redis.compressors.zstd.ZStdCompressor',
+                'CONNECTION_POOL_KWARGS': {
+                    'max_connections': 20,
+                    'retry_on_timeout': True,
+                },
+            },
+            'TIMEOUT': 300,
+        },
     }
 else:
     logging.info("Redis unavailable, using in-memory cache")
@@ -155,7 +171,12 @@ else:
             'LOCATION': 'crypto-tracker-cache',
             'TIMEOUT': 300,
             'OPTIONS': {'MAX_ENTRIES': 1000},
-        }
+        },
+        'bulk': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'crypto-tracker-bulk',
+            'TIMEOUT': 300,
+        },
     }
 
 # Channels Configuration
@@ -177,6 +198,22 @@ else:
         },
     }
 
+# Market data ingestion (seconds between CoinGecko refreshes)
+MARKET_DATA_REFRESH_INTERVAL = env.int('MARKET_DATA_REFRESH_INTERVAL', default=300)
+# Number of top coins (by market cap) tracked in each snapshot, fetched 250 per page
+MARKET_DATA_COINS = env.int('MARKET_DATA_COINS', default=150)
+# Entries in each worker's process-local cache of hot, versioned values (snapshots and derived views)
+LOCAL_CACHE_MAX_ENTRIES = env.int('LOCAL_CACHE_MAX_ENTRIES', default=64)
+
+# News ingestion (seconds between NewsAPI pulls, 100-article pages per pull, days articles are kept)
+NEWS_INGEST_INTERVAL = env.int('NEWS_INGEST_INTERVAL', default=900)
+NEWS_INGEST_PAGES = env.int('NEWS_INGEST_PAGES', default=3)
+NEWS_RETENTION_DAYS = env.int('NEWS_RETENTION_DAYS', default=30)
+# Worker processes for scoring large article backfills (0 scores in the calling process)
+NEWS_SCORING_PROCESSES = env.int('NEWS_SCORING_PROCESSES', default=0)
+# Half-life (seconds) of an article's weight in the running market and per-coin sentiment
+NEWS_SENTIMENT_HALF_LIFE = env.int('NEWS_SENTIMENT_HALF_LIFE', default=21600)
+
 # Celery Configuration
 if USE_REDIS:
     CELERY_BROKER_URL = REDIS_URL
@@ -188,7 +225,15 @@ if USE_REDIS:
     CELERY_BEAT_SCHEDULE = {
         'update-market-data': {
             'task': 'tracker.tasks.update_market_data',
-            'schedule': 300.0,
+            'schedule': float(MARKET_DATA_REFRESH_INTERVAL),
+        },
+        'refresh-coin-registry': {
+            'task': 'tracker.tasks.refresh_coin_registry',
+            'schedule': 86400.0,
+        },
+        'ingest-news': {
+            'task': 'tracker.tasks.ingest_news',
+            'schedule': float(NEWS_INGEST_INTERVAL),
         },
     }
 else:
@@ -0,0 +1,145 @@
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .broadcast import send_to_groups, user_alerts_group
+from .models import Alert
+
+logger = logging.getLogger(__name__)
+
+ALERTS_VERSION_KEY = 'alerts_version'
+UPDATE_BATCH_SIZE = 500
+
+class AlertBook:
+    """Active alerts for one coin, kept sorted by target price per condition"""
+    __slots__ = ('above_prices', 'above_ids', 'below_prices', 'below_ids')
+
+    def __init__(self):
+        self.above_prices: List[float] = []
+        self.above_ids: List[int] = []
+        self.below_prices: List[float] = []
+        self.below_ids: List[int] = []
+
+    def add(self, alert_id: int, condition: str, target_price: float) -> None:
+        """Append an alert; callers add in ascending target_price order"""
+        if condition == 'above':
+            self.above_prices.append(target_price)
+            self.above_ids.append(alert_id)
+        else:
+            self.below_prices.append(target_price)
+            self.below_ids.append(alert_id)
+
+    def triggered(self, price: float) -> List[int]:
+        """IDs of alerts crossed by price: 'above' targets <= price, 'below' targets >= price"""
+        return (self.above_ids[:bisect_right(self.above_prices, price)] +
+                self.below_ids[bisect_left(self.below_prices, price):])
+
+    def discard(self, alert_ids: set) -> None:
+        for prices_attr, ids_attr in (('above_prices', 'above_ids'), ('below_prices', 'below_ids')):
+            kept = [(p, i) for p, i in zip(getattr(self, prices_attr), getattr(self, ids_attr)) if i not in alert_ids]
+            setattr(self, prices_attr, [p for p, _ in kept])
+            setattr(self, ids_attr, [i for _, i in kept])
+
+    def __len__(self):
+        return len(self.above_ids) + len(self.below_ids)
+
+# ------------------ Book cache ------------------
+
+_books: Dict[str, AlertBook] = {}
+_alert_meta: Dict[int, Tuple[int, str, str, float]] = {}  # id -> (user_id, coin, condition, target)
+_books_version = None
+_books_lock = threading.Lock()
+
+def get_alerts_version() -> int:
+    return cache.get(ALERTS_VERSION_KEY) or 0
+
+def bump_alerts_version() -> int:
+    """Mark every process's alert books as stale"""
+    cache.add(ALERTS_VERSION_KEY, 0, timeout=None)
+    return cache.incr(ALERTS_VERSION_KEY)
+
+def _load_books() -> None:
+    global _books, _alert_meta
+    books = defaultdict(AlertBook)
+    meta = {}
+    rows = (Alert.objects.filter(is_active=True)
+            .order_by('target_price')
+            .values_list('id', 'user_id', 'cryptocurrency', 'condition', 'target_price'))
+    for alert_id, user_id, coin, condition, target_price in rows.iterator(chunk_size=5000):
+        target = float(target_price)
+        books[coin].add(alert_id, condition, target)
+        meta[alert_id] = (user_id, coin, condition, target)
+    _books, _alert_meta = dict(books), meta
+    logger.info(f"Loaded {len(meta)} active alerts across {len(_books)} coins")
+
+def get_alert_books() -> Dict[str, AlertBook]:
+    """Per-coin alert books, reloaded only when the alerts version changes"""
+    global _books_version
+    version = get_alerts_version()
+    with _books_lock:
+        if version != _books_version:
+            _load_books()
+            _books_version = version
+        return _books
+
+# ------------------ Evaluation ------------------
+
+def evaluate_alerts(market_data: Dict) -> int:
+    """Trigger every active alert crossed by the snapshot prices.
+
+    Each coin costs two bisects on its sorted book; triggered alerts are
+    deactivated with batched UPDATEs and pushed to their owners.
+    """
+    global _books_version
+    books = get_alert_books()
+    triggered = []
+    for coin_id, book in books.items():
+        data = market_data.get(coin_id)
+        # Emergency default prices are placeholders, never something to trigger on
+        if not data or data.get('usd') is None or data.get('last_updated') == 'FALLBACK':
+            continue
+        triggered.extend(book.triggered(float(data['usd'])))
+    if not triggered:
+        return 0
+
+    with transaction.atomic():
+        for start in range(0, len(triggered), UPDATE_BATCH_SIZE):
+            Alert.objects.filter(id__in=triggered[start:start + UPDATE_BATCH_SIZE], is_active=True).update(is_active=False)
+
+    triggered_set = set(triggered)
+    with _books_lock:
+        new_version = bump_alerts_version()
+        # Nothing else changed since our load, so prune in place instead of reloading
+        if _books_version is not None and new_version == _books_version + 1:
+            for coin_id in {_alert_meta[i][1] for i in triggered_set if i in _alert_meta}:
+                _books[coin_id].discard(triggered_set)
+            _books_version = new_version
+
+    _notify_users(triggered, market_data)
+    logger.info(f"Triggered {len(triggered)} alerts")
+    return len(triggered)
+
+def _notify_users(alert_ids: List[int], market_data: Dict) -> None:
+    with _books_lock:
+        metas = [(alert_id, _alert_meta.pop(alert_id, None)) for alert_id in alert_ids]
+    by_user = defaultdict(list)
+    for alert_id, meta in metas:
+        if meta is None:
+            continue
+        user_id, coin_id, condition, target = meta
+        by_user[user_id].append({
+            "id": alert_id,
+            "cryptocurrency": coin_id,
+            "condition": condition,
+            "target_price": target,
+            "price": float(market_data[coin_id]['usd']),
+        })
+    send_to_groups(
+        (user_alerts_group(user_id), {"type": "alert.triggered", "alerts": alerts})
+        for user_id, alerts in by_user.items()
+    )
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+import weakref
+from typing import Any, Dict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+    from django_redis.cache import RedisCache
+    ASYNC_REDIS_AVAILABLE = True
+except ImportError:
+    ASYNC_REDIS_AVAILABLE = False
+
+# One client per event loop and cache alias: redis.asyncio connections are bound to the loop that opened them
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+def _redis_client(alias: str):
+    """Native asyncio Redis client for a cache alias, or None for other backends"""
+    backend = caches[alias]
+    if not ASYNC_REDIS_AVAILABLE or not isinstance(backend, RedisCache):
+        return None
+    loop_clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = loop_clients.get(alias)
+    if client is None:
+        config = settings.CACHES[alias]
+        location = config['LOCATION']
+        pool_kwargs = config.get('OPTIONS', {}).get('CONNECTION_POOL_KWARGS', {})
+        client = aioredis.from_url(location[0] if isinstance(location, (list, tuple)) else location,
+                                   max_connections=pool_kwargs.get('max_connections'))
+        loop_clients[alias] = client
+    return client
+
+async def cache_aget(key: str, default: Any = None, alias: str = 'default') -> Any:
+    """Async cache.get() that never waits on Django's single sync thread.
+
+    Django's cache.aget() runs the sync get() thread-sensitively, so under
+    ASGI every read queues behind the one sync thread. With django-redis the
+    value is read on the event loop and decoded by the backend's own client
+    (so with the alias's serializer and compressor); other backends run
+    get() in the shared thread pool instead.
+    """
+    backend = caches[alias]
+    client = _redis_client(alias)
+    if client is None:
+        return await sync_to_async(backend.get, thread_sensitive=False)(key, default)
+    value = await client.get(backend.make_key(key))
+    return default if value is None else backend.client.decode(value)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from .serialization import json_text
+from .snapshots import get_market_sentiment, get_snapshot_view, set_snapshot_view
+
+logger = logging.getLogger(__name__)
+
+MARKET_TICKER_GROUP = 'market_ticker'
+TICKER_SNAPSHOT_VIEW = 'ticker'
+_GROUP_NAME_RE = re.compile(r'^[a-zA-Z0-9\-._]{1,80}$')
+
+def user_alerts_group(user_id: int) -> str:
+    return f"alerts_{user_id}"
+
+def coin_ticker_group(coin_id: str) -> Optional[str]:
+    """Channel-layer group for one coin's updates, or None if the ID can't name a group"""
+    group = f"ticker.{coin_id}"
+    return group if _GROUP_NAME_RE.match(group) else None
+
+def send_to_group(group: str, message: Dict) -> bool:
+    """Send a message to a channel-layer group from synchronous code"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return False
+    try:
+        async_to_sync(channel_layer.group_send)(group, message)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to send to channel group {group}: {e}", exc_info=True)
+        return False
+
+def send_to_groups(messages: Iterable[Tuple[str, Dict]]) -> int:
+    """Send many group messages concurrently in a single event-loop round trip"""
+    channel_layer = get_channel_layer()
+    messages = list(messages)
+    if channel_layer is None or not messages:
+        return 0
+
+    async def _send_all():
+        results = await asyncio.gather(
+            *(channel_layer.group_send(group, message) for group, message in messages),
+            return_exceptions=True,
+        )
+        return sum(1 for result in results if not isinstance(result, Exception))
+
+    try:
+        return async_to_sync(_send_all)()
+    except Exception as e:
+        logger.error(f"Failed to fan out {len(messages)} channel messages: {e}", exc_info=True)
+        return 0
+
+def build_ticker_message(market_data: Dict, sentiment: Dict, version: int) -> Dict:
+    """Full-snapshot payload the ticker socket sends on subscribe and resync"""
+    return {'type': 'snapshot', 'version': version, 'market_data': market_data, 'sentiment': sentiment}
+
+def compute_delta(previous: Dict, current: Dict) -> Tuple[Dict, List[str]]:
+    """Per-coin fields that changed between two snapshots, plus coins that dropped out"""
+    changes = {}
+    for coin_id, data in current.items():
+        old = previous.get(coin_id)
+        if old is None:
+            changes[coin_id] = data
+            continue
+        diff = {field: value for field, value in data.items() if old.get(field) != value}
+        if diff:
+            changes[coin_id] = diff
+    removed = [coin_id for coin_id in previous if coin_id not in current]
+    return changes, removed
+
+def encode_ticker_snapshot(market_data: Dict, sentiment: Dict, version: int) -> str:
+    """Serialize a full snapshot once and keep the text for every subscriber of this version"""
+    text = json_text(build_ticker_message(market_data, sentiment, version))
+    set_snapshot_view(TICKER_SNAPSHOT_VIEW, version, text)
+    return text
+
+def get_ticker_snapshot_text() -> str:
+    """Encoded full snapshot for the current version, built on first use"""
+    return get_snapshot_view(TICKER_SNAPSHOT_VIEW, lambda market_data, version: json_text(
+        build_ticker_message(market_data, get_market_sentiment(), version)))
+
+def broadcast_market_snapshot(previous: Dict, previous_version: int, market_data: Dict,
+                              sentiment: Dict, version: int) -> bool:
+    """Push the changes since previous_version to every connected ticker socket.
+
+    The delta is encoded once here and forwarded verbatim by each consumer;
+    clients whose last sequence is not `base` ask for a resync.
+    """
+    encode_ticker_snapshot(market_data, sentiment, version)
+    changes, removed = compute_delta(previous, market_data)
+    text = json_text({
+        'type': 'delta',
+        'seq': version,
+        'base': previous_version,
+        'changes': changes,
+        'removed': removed,
+        'sentiment': sentiment,
+    })
+    sent = send_to_group(MARKET_TICKER_GROUP, {'type': 'market.update', 'text': text})
+    broadcast_coin_updates(changes, market_data, version)
+    return sent
+
+def build_coins_message(market_data: Dict, coin_ids: Iterable[str], version: int) -> Dict:
+    """Snapshot restricted to the coins a filtered subscriber asked for"""
+    return {
+        'type': 'coins',
+        'seq': version,
+        'market_data': {coin_id: market_data[coin_id] for coin_id in coin_ids if coin_id in market_data},
+    }
+
+def broadcast_coin_updates(changes: Dict, market_data: Dict, version: int) -> int:
+    """Fan each changed coin's full row out to its per-coin group.
+
+    Filtered subscribers only sit in the groups of the coins they watch, so
+    they receive (and the channel layer carries) just those rows.
+    """
+    messages = []
+    for coin_id in changes:
+        group = coin_ticker_group(coin_id)
+        if group is None:
+            continue
+        text = json_text({'type': 'coin', 'seq': version, 'coin': coin_id, 'data': market_data[coin_id]})
+        messages.append((group, {'type': 'market.update', 'text': text}))
+    return send_to_groups(messages)
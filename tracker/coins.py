@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+COIN_REGISTRY_KEY = 'coin_registry'
+COIN_REGISTRY_VERSION_KEY = 'coin_registry_version'
+REGISTRY_REFRESH_QUEUED_KEY = 'coin_registry_refresh_queued'
+VERSION_CHECK_INTERVAL = 30  # seconds between version-stamp reads per process
+
+class CoinRegistry:
+    """Every CoinGecko coin ID with symbol and name lookups, held in process memory"""
+
+    def __init__(self, coins: Iterable[Tuple[str, str, str]] = (), version: int = 0):
+        self.version = version
+        self.coins: Dict[str, Tuple[str, str]] = {}  # id -> (symbol, name)
+        by_symbol: Dict[str, List[str]] = {}
+        by_name: Dict[str, List[str]] = {}
+        for coin_id, symbol, name in coins:
+            self.coins[coin_id] = (symbol, name)
+            by_symbol.setdefault(symbol.lower(), []).append(coin_id)
+            by_name.setdefault(name.lower(), []).append(coin_id)
+        self.ids = frozenset(self.coins)
+        self.by_symbol = {key: tuple(ids) for key, ids in by_symbol.items()}
+        self.by_name = {key: tuple(ids) for key, ids in by_name.items()}
+
+    def __contains__(self, coin_id: str) -> bool:
+        return coin_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates(self, text: str) -> Tuple[str, ...]:
+        """IDs an exact ID, symbol or name refers to (several for shared symbols or names)"""
+        key = text.strip().lower()
+        if key in self.ids:
+            return (key,)
+        # A symbol can also be another coin's name, so both lookups count
+        return tuple(dict.fromkeys(self.by_symbol.get(key, ()) + self.by_name.get(key, ())))
+
+    def resolve(self, text: str, ranks: Optional[Dict[str, int]] = None) -> Optional[str]:
+        """Canonical coin ID for an ID, symbol or name; ambiguous matches go to the best-ranked coin"""
+        candidates = self.candidates(text)
+        if len(candidates) == 1:
+            return candidates[0]
+        ranked = [coin_id for coin_id in candidates if (ranks or {}).get(coin_id)]
+        if ranked:
+            return min(ranked, key=ranks.get)
+        return None
+
+# ------------------ Process-local copy ------------------
+
+_registry = CoinRegistry()
+_registry_lock = threading.Lock()
+_last_version_check = 0.0
+
+def get_coin_registry() -> CoinRegistry:
+    """Return the process-local registry, reloading it only when the shared version changes.
+
+    The version stamp is read at most every VERSION_CHECK_INTERVAL seconds, so
+    membership checks normally cost no cache round trip at all.
+    """
+    global _registry, _last_version_check
+    now = time.monotonic()
+    if _registry and now - _last_version_check < VERSION_CHECK_INTERVAL:
+        return _registry
+
+    with _registry_lock:
+        _last_version_check = now
+        version = cache.get(COIN_REGISTRY_VERSION_KEY) or 0
+        if version and version != _registry.version:
+            coins = caches['bulk'].get(COIN_REGISTRY_KEY)
+            if coins:
+                _registry = CoinRegistry(coins, version)
+                logger.info(f"Loaded coin registry v{version} ({len(_registry)} coins)")
+        if not version or not _registry:
+            request_registry_refresh()
+    return _registry
+
+def publish_coin_registry(coins: List[Tuple[str, str, str]]) -> int:
+    """Store the (id, symbol, name) list for every process and bump the registry version"""
+    caches['bulk'].set(COIN_REGISTRY_KEY, coins, timeout=None)
+    cache.add(COIN_REGISTRY_VERSION_KEY, 0, timeout=None)
+    version = cache.incr(COIN_REGISTRY_VERSION_KEY)
+    cache.delete(REGISTRY_REFRESH_QUEUED_KEY)
+    logger.info(f"Published coin registry v{version} ({len(coins)} coins)")
+    return version
+
+def request_registry_refresh() -> bool:
+    """Queue a coin list refresh unless one is already pending"""
+    if not cache.add(REGISTRY_REFRESH_QUEUED_KEY, 1, timeout=3600):
+        return False
+
+    from .tasks import refresh_coin_registry
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        threading.Thread(target=refresh_coin_registry, daemon=True).start()
+    else:
+        refresh_coin_registry.delay()
+    logger.info("Queued background coin registry refresh")
+    return True
+
+# ------------------ Validation ------------------
+
+def resolve_coin(text: str) -> Optional[str]:
+    """Coin ID for user input such as "bitcoin", "BTC" or "Bitcoin" (None if unknown)"""
+    from .snapshots import get_columnar_snapshot
+    registry = get_coin_registry()
+    candidates = registry.candidates(text)
+    if len(candidates) > 1:
+        return registry.resolve(text, get_columnar_snapshot().ranks())
+    return candidates[0] if candidates else None
+
+def validate_coin(text: str) -> str:
+    """Return the coin ID for user input or raise ValidationError"""
+    if not text or not text.strip():
+        raise ValidationError("Cryptocurrency is required.")
+    if not get_coin_registry():
+        logger.warning("Coin registry empty, skipping validation")
+        return text.strip().lower()
+    coin_id = resolve_coin(text)
+    if coin_id is None:
+        logger.info(f"Invalid cryptocurrency: {text.strip().lower()}")
+        if len(get_coin_registry().candidates(text)) > 1:
+            raise ValidationError("Ambiguous cryptocurrency symbol, please use the coin ID.")
+        raise ValidationError("Invalid cryptocurrency.")
+    return coin_id
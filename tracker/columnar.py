@@ -0,0 +1,117 @@
+import json
+import struct
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+MAGIC = b'CSNAP1'
+_HEADER = struct.Struct('<6sI')  # magic, header length
+
+# Numeric fields of a market snapshot row and the dtype of their column
+NUMERIC_COLUMNS = {
+    'usd': np.float64,
+    'usd_24h_change': np.float64,
+    'volume_24h': np.float64,
+    'market_cap': np.float64,
+    'market_cap_rank': np.int64,
+}
+TEXT_COLUMNS = ('symbol', 'name', 'last_updated', 'sentiment')
+NO_RANK = -1
+
+class ColumnarSnapshot:
+    """A market snapshot stored column by column, with an id -> row index.
+
+    Numeric fields are NumPy arrays, so sorting, top-N and aggregates run on
+    whole columns, and the binary form is the raw column buffers plus a small
+    JSON header. from_bytes() wraps those buffers without copying them.
+    """
+
+    def __init__(self, ids: List[str], columns: Dict[str, np.ndarray], text: Dict[str, List[str]]):
+        self.ids = ids
+        self.index = {coin_id: row for row, coin_id in enumerate(ids)}
+        self.columns = columns
+        self.text = text
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, coin_id: str) -> bool:
+        return coin_id in self.index
+
+    @classmethod
+    def from_dict(cls, market_data: Dict[str, Dict]) -> 'ColumnarSnapshot':
+        ids = list(market_data)
+        rows = [market_data[coin_id] for coin_id in ids]
+        columns = {}
+        for name, dtype in NUMERIC_COLUMNS.items():
+            if name == 'market_cap_rank':
+                values = [row.get(name) if row.get(name) is not None else NO_RANK for row in rows]
+            else:
+                values = [row.get(name) or 0.0 for row in rows]
+            columns[name] = np.array(values, dtype=dtype)
+        text = {name: [row.get(name) or '' for row in rows] for name in TEXT_COLUMNS}
+        return cls(ids, columns, text)
+
+    def row(self, coin_id: str) -> Optional[Dict]:
+        """One coin in the dict shape the rest of the app uses"""
+        index = self.index.get(coin_id)
+        if index is None:
+            return None
+        data = {name: column[index].item() for name, column in self.columns.items()}
+        if data['market_cap_rank'] == NO_RANK:
+            data['market_cap_rank'] = None
+        data.update((name, values[index]) for name, values in self.text.items())
+        return data
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {coin_id: self.row(coin_id) for coin_id in self.ids}
+
+    # ------------------ Binary form ------------------
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({
+            'ids': self.ids,
+            'text': self.text,
+            'columns': [name for name in NUMERIC_COLUMNS],
+        }, separators=(',', ':')).encode()
+        # Pad the header so every column starts 8-byte aligned
+        header += b' ' * (-(_HEADER.size + len(header)) % 8)
+        buffers = [np.ascontiguousarray(self.columns[name], dtype=dtype).tobytes()
+                   for name, dtype in NUMERIC_COLUMNS.items()]
+        return b''.join([_HEADER.pack(MAGIC, len(header)), header, *buffers])
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> 'ColumnarSnapshot':
+        magic, header_length = _HEADER.unpack_from(payload)
+        if magic != MAGIC:
+            raise ValueError("Not a columnar market snapshot")
+        offset = _HEADER.size + header_length
+        header = json.loads(payload[_HEADER.size:offset])
+        count = len(header['ids'])
+        columns = {}
+        for name in header['columns']:
+            dtype = np.dtype(NUMERIC_COLUMNS[name])
+            columns[name] = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+            offset += dtype.itemsize * count
+        return cls(header['ids'], columns, header['text'])
+
+    # ------------------ Queries ------------------
+
+    def prices(self, coin_ids: Iterable[str]) -> np.ndarray:
+        """USD prices for the given coins in order (0.0 for coins not in the snapshot)"""
+        usd = self.columns['usd']
+        return np.array([usd[self.index[coin_id]] if coin_id in self.index else 0.0 for coin_id in coin_ids],
+                        dtype=np.float64)
+
+    def ranks(self) -> Dict[str, int]:
+        return {coin_id: int(rank) for coin_id, rank in zip(self.ids, self.columns['market_cap_rank']) if rank > 0}
+
+    def top(self, n: int, by: str = 'market_cap', descending: bool = True) -> List[str]:
+        """IDs of the n coins with the largest (or smallest) value in a numeric column"""
+        values = self.columns[by]
+        n = min(n, len(values))
+        if not n:
+            return []
+        keys = -values if descending else values
+        rows = np.argpartition(keys, n - 1)[:n] if n < len(values) else np.arange(len(values))
+        return [self.ids[row] for row in rows[np.argsort(keys[rows], kind='stable')]]
@@ -1,17 +1,106 @@
 import json
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from .utils import fetch_market_data  # make sure this returns a dict
+from .broadcast import (
+    MARKET_TICKER_GROUP, build_coins_message, coin_ticker_group, get_ticker_snapshot_text, user_alerts_group,
+)
+from .serialization import json_text
+from .snapshots import get_market_snapshot, get_snapshot_version
+
+MAX_SUBSCRIBED_COINS = 100
+
+def _read_coins_message(coin_ids):
+    return json_text(build_coins_message(get_market_snapshot(), coin_ids, get_snapshot_version()))
 
 class MarketTickerConsumer(AsyncWebsocketConsumer):
     async def connect(self):
+        self.alerts_group = None
+        self.coin_groups = {}
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            self.alerts_group = user_alerts_group(user.id)
+            await self.channel_layer.group_add(self.alerts_group, self.channel_name)
+        # ?coins=bitcoin,ethereum starts on the per-coin feed without a full snapshot first
+        query = parse_qs(self.scope.get('query_string', b'').decode('latin-1'))
+        coin_ids = [coin_id for value in query.get('coins', []) for coin_id in value.split(',') if coin_id]
+        await self.add_coin_groups(coin_ids)
+        if not self.coin_groups:
+            await self.channel_layer.group_add(MARKET_TICKER_GROUP, self.channel_name)
         await self.accept()
-        # Send initial data
-        market_data = fetch_market_data()
-        await self.send(text_data=json.dumps({'market_data': market_data}))
+        # Initial snapshot comes from the cache; the ingester pushes deltas after that
+        if self.coin_groups:
+            await self.send_coins()
+        else:
+            await self.send_snapshot()
+
+    async def send_snapshot(self):
+        await self.send(text_data=await sync_to_async(get_ticker_snapshot_text, thread_sensitive=False)())
 
     async def receive(self, text_data):
-        # Can handle client messages if needed
-        pass
+        try:
+            message = json.loads(text_data)
+        except (TypeError, ValueError):
+            return
+        if not isinstance(message, dict):
+            return
+        action = message.get('action')
+        if action == 'resync':
+            if self.coin_groups:
+                await self.send_coins()
+            else:
+                await self.send_snapshot()
+        elif action == 'subscribe':
+            await self.subscribe(message.get('coins') or [])
+        elif action == 'unsubscribe':
+            await self.unsubscribe(message.get('coins') or [])
+
+    async def send_coins(self):
+        text = await sync_to_async(_read_coins_message, thread_sensitive=False)(list(self.coin_groups))
+        await self.send(text_data=text)
+
+    async def add_coin_groups(self, coin_ids):
+        for coin_id in coin_ids:
+            if len(self.coin_groups) >= MAX_SUBSCRIBED_COINS:
+                break
+            coin_id = str(coin_id).lower()
+            group = coin_ticker_group(coin_id)
+            if group is None or coin_id in self.coin_groups:
+                continue
+            await self.channel_layer.group_add(group, self.channel_name)
+            self.coin_groups[coin_id] = group
+
+    async def subscribe(self, coin_ids):
+        """Switch to (or extend) a per-coin feed instead of the full market broadcast"""
+        was_filtered = bool(self.coin_groups)
+        await self.add_coin_groups(coin_ids)
+        if self.coin_groups and not was_filtered:
+            await self.channel_layer.group_discard(MARKET_TICKER_GROUP, self.channel_name)
+        if self.coin_groups:
+            await self.send_coins()
+
+    async def unsubscribe(self, coin_ids):
+        if not self.coin_groups:
+            return  # already on the full market feed
+        for coin_id in coin_ids:
+            group = self.coin_groups.pop(str(coin_id).lower(), None)
+            if group:
+                await self.channel_layer.group_discard(group, self.channel_name)
+        if not self.coin_groups:
+            # Nothing left to filter on: fall back to the full market feed
+            await self.channel_layer.group_add(MARKET_TICKER_GROUP, self.channel_name)
+            await self.send_snapshot()
 
     async def disconnect(self, close_code):
-        pass
+        await self.channel_layer.group_discard(MARKET_TICKER_GROUP, self.channel_name)
+        for group in getattr(self, 'coin_groups', {}).values():
+            await self.channel_layer.group_discard(group, self.channel_name)
+        if self.alerts_group:
+            await self.channel_layer.group_discard(self.alerts_group, self.channel_name)
+
+    async def market_update(self, event):
+        # Already encoded once by the ingester for all subscribers
+        await self.send(text_data=event['text'])
+
+    async def alert_triggered(self, event):
+        await self.send(text_data=json_text({'type': 'alerts', 'alerts': event['alerts']}))
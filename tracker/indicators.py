@@ -0,0 +1,213 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .snapshots import get_snapshot_version
+from .timeseries import get_price_series
+
+logger = logging.getLogger(__name__)
+
+HISTORY_LIMIT = 20000
+MAX_CACHED_SERIES = 16
+EMA_BLOCK_SIZE = 128
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_STDDEV = 2.0
+
+# ------------------ Vectorized primitives ------------------
+
+def ema(values: np.ndarray, alpha: float, prev: Optional[float] = None) -> np.ndarray:
+    """Exponential moving average, continuing from `prev` (seeded with values[0] if None).
+
+    The recurrence is solved in closed form one block at a time, so the whole
+    array is computed with cumsum instead of a Python loop. Blocks keep the
+    (1 - alpha) ** -k weights well inside float64 range.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty_like(values)
+    if not len(values):
+        return out
+    if alpha >= 1.0:
+        out[:] = values
+        return out
+    if prev is None or np.isnan(prev):
+        prev = values[0]
+
+    decay = 1.0 - alpha
+    for start in range(0, len(values), EMA_BLOCK_SIZE):
+        block = values[start:start + EMA_BLOCK_SIZE]
+        powers = decay ** np.arange(1, len(block) + 1)
+        out[start:start + len(block)] = powers * (prev + alpha * np.cumsum(block / powers))
+        prev = out[start + len(block) - 1]
+    return out
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average; the first window-1 points are NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).mean(axis=1)
+    return out
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).std(axis=1)
+    return out
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray, prev_close: Optional[float] = None) -> np.ndarray:
+    previous = np.concatenate(([np.nan if prev_close is None else prev_close], close[:-1]))
+    ranges = np.vstack((high - low, np.abs(high - previous), np.abs(low - previous)))
+    return np.nanmax(ranges, axis=0)
+
+# ------------------ Incremental indicator series ------------------
+
+class IndicatorSeries:
+    """SMA/EMA/RSI/MACD/Bollinger/VWAP/ATR arrays for one (coin, resolution, window).
+
+    Every recursive quantity is kept as a full array, so extending the series
+    only computes the new points from the last stored state, and replacing a
+    still-open rollup bucket is a plain truncation.
+    """
+
+    INPUTS = ('timestamp', 'high', 'low', 'close', 'volume')
+    OUTPUTS = ('sma', 'ema', 'rsi', 'macd', 'macd_signal', 'macd_hist',
+               'bollinger_upper', 'bollinger_lower', 'vwap', 'atr')
+    STATE = ('_ema_fast', '_ema_slow', '_avg_gain', '_avg_loss', '_cum_pv', '_cum_v')
+
+    def __init__(self, window: int = 14):
+        self.window = window
+        self.version = None
+        self.columns = {name: np.empty(0, dtype=np.int64 if name == 'timestamp' else np.float64)
+                        for name in self.INPUTS + self.OUTPUTS + self.STATE}
+
+    def __len__(self):
+        return len(self.columns['timestamp'])
+
+    @property
+    def last_timestamp(self) -> Optional[datetime]:
+        if not len(self):
+            return None
+        return datetime.fromtimestamp(int(self.columns['timestamp'][-1]), tz=dt_timezone.utc)
+
+    def _last(self, name: str) -> Optional[float]:
+        column = self.columns[name]
+        return float(column[-1]) if len(column) else None
+
+    def _truncate(self, size: int) -> None:
+        for name in self.columns:
+            self.columns[name] = self.columns[name][:size]
+
+    def extend(self, points: List[Dict]) -> None:
+        """Append OHLCV points (as returned by get_price_series) and compute their indicators"""
+        if not points:
+            return
+        timestamps = np.array([int(p['timestamp'].timestamp()) for p in points], dtype=np.int64)
+        # The latest rollup bucket keeps changing until it closes, so re-read points replace stored ones
+        self._truncate(int(np.searchsorted(self.columns['timestamp'], timestamps[0], side='left')))
+
+        new = {
+            'timestamp': timestamps,
+            'high': np.array([float(p['high']) for p in points]),
+            'low': np.array([float(p['low']) for p in points]),
+            'close': np.array([float(p['close']) for p in points]),
+            'volume': np.array([float(p['volume']) if p['volume'] is not None else 0.0 for p in points]),
+        }
+        new.update(self._compute(new))
+        for name, values in new.items():
+            self.columns[name] = np.concatenate((self.columns[name], values))
+        # Running state lives in the last rows, so dropping the oldest points keeps it intact
+        if len(self) > HISTORY_LIMIT:
+            for name in self.columns:
+                self.columns[name] = self.columns[name][-HISTORY_LIMIT:]
+
+    def _compute(self, new: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        window = self.window
+        close, high, low, volume = new['close'], new['high'], new['low'], new['volume']
+        prev_close = self._last('close')
+        out = {}
+
+        # Window-based indicators only need the last window-1 stored closes
+        tail = np.concatenate((self.columns['close'][-(window - 1):] if window > 1 else np.empty(0), close))
+        offset = len(tail) - len(close)
+        mean = sma(tail, window)[offset:]
+        std = rolling_std(tail, window)[offset:]
+        out['sma'] = mean
+        out['bollinger_upper'] = mean + BOLLINGER_STDDEV * std
+        out['bollinger_lower'] = mean - BOLLINGER_STDDEV * std
+
+        out['ema'] = ema(close, 2.0 / (window + 1), self._last('ema'))
+        out['_ema_fast'] = ema(close, 2.0 / (MACD_FAST + 1), self._last('_ema_fast'))
+        out['_ema_slow'] = ema(close, 2.0 / (MACD_SLOW + 1), self._last('_ema_slow'))
+        out['macd'] = out['_ema_fast'] - out['_ema_slow']
+        out['macd_signal'] = ema(out['macd'], 2.0 / (MACD_SIGNAL + 1), self._last('macd_signal'))
+        out['macd_hist'] = out['macd'] - out['macd_signal']
+
+        # RSI and ATR use Wilder smoothing (alpha = 1/window)
+        deltas = np.diff(np.concatenate(([close[0] if prev_close is None else prev_close], close)))
+        out['_avg_gain'] = ema(np.clip(deltas, 0, None), 1.0 / window, self._last('_avg_gain'))
+        out['_avg_loss'] = ema(np.clip(-deltas, 0, None), 1.0 / window, self._last('_avg_loss'))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = out['_avg_gain'] / out['_avg_loss']
+            out['rsi'] = np.where(out['_avg_loss'] == 0, 100.0, 100.0 - 100.0 / (1.0 + rs))
+        out['atr'] = ema(true_range(high, low, close, prev_close), 1.0 / window, self._last('atr'))
+
+        typical = (high + low + close) / 3.0
+        out['_cum_pv'] = (self._last('_cum_pv') or 0.0) + np.cumsum(typical * volume)
+        out['_cum_v'] = (self._last('_cum_v') or 0.0) + np.cumsum(volume)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['vwap'] = np.where(out['_cum_v'] > 0, out['_cum_pv'] / out['_cum_v'], np.nan)
+        return out
+
+    def to_chart(self, points: int = 200) -> Dict[str, List]:
+        """Last `points` values of every public column, JSON-ready (NaN becomes None)"""
+        data = {
+            "labels": [datetime.fromtimestamp(int(ts), tz=dt_timezone.utc).strftime("%Y-%m-%d %H:%M")
+                       for ts in self.columns['timestamp'][-points:]],
+            "values": _to_json_list(self.columns['close'][-points:]),
+        }
+        for name in self.OUTPUTS:
+            data[name] = _to_json_list(self.columns[name][-points:])
+        return data
+
+def _to_json_list(values: np.ndarray) -> List[Optional[float]]:
+    return [None if np.isnan(v) else round(float(v), 8) for v in values]
+
+# ------------------ Cache ------------------
+
+_series_cache: "OrderedDict[tuple, IndicatorSeries]" = OrderedDict()
+_series_lock = threading.Lock()
+
+def get_indicator_series(coin_id: str, resolution: str = '1h', window: int = 14) -> IndicatorSeries:
+    """Return the cached indicator series, extended with any points stored since it was built.
+
+    Series are cached per process and per (coin, resolution, window); a new
+    market snapshot only reads the rows at or after the last cached point.
+    """
+    key = (coin_id, resolution, window)
+    with _series_lock:
+        series = _series_cache.get(key)
+        if series is None:
+            series = IndicatorSeries(window)
+            _series_cache[key] = series
+        _series_cache.move_to_end(key)
+        while len(_series_cache) > MAX_CACHED_SERIES:
+            _series_cache.popitem(last=False)
+
+    version = get_snapshot_version()
+    with _series_lock:
+        if series.version == version and len(series):
+            return series
+        since = series.last_timestamp
+    # Read outside the lock so one slow query does not hold up every other chart
+    points = get_price_series(coin_id, resolution, since=since, limit=HISTORY_LIMIT)
+    with _series_lock:
+        # Another request may have extended the series meanwhile; its rows are at least as new
+        if series.last_timestamp == since:
+            series.extend(points)
+            series.version = version
+    return series
@@ -0,0 +1,62 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class LocalLRUCache:
+    """Bounded, thread-safe, process-local LRU used as an L1 in front of the shared cache.
+
+    Keys must include the version of the data they hold (e.g. the snapshot
+    version), so entries never need invalidating: a new version is a new key
+    and old ones fall off the LRU end.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Optional[Any]:
+        """Return the local copy, or call loader (usually a shared-cache read) and keep its result.
+
+        None results are not stored, so a missing shared entry is retried next time.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+local_cache = LocalLRUCache(getattr(settings, 'LOCAL_CACHE_MAX_ENTRIES', 64))
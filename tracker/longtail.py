@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from .asynccache import cache_aget
+from .models import Portfolio, Watchlist
+from .snapshots import get_columnar_snapshot
+from .upstream import UpstreamRateLimited, fetch_simple_prices
+
+logger = logging.getLogger(__name__)
+
+LONGTAIL_PRICES_KEY = 'longtail_prices'
+LONGTAIL_REFRESH_QUEUED_KEY = 'longtail_prices_refresh_queued'
+
+def _stale_after() -> int:
+    # A quote is stale once it has missed a couple of ingestion cycles
+    return settings.MARKET_DATA_REFRESH_INTERVAL * 3
+
+def held_coins(tracked: Optional[Iterable[str]] = None) -> Set[str]:
+    """Coins in any portfolio or watchlist that the market snapshot (or `tracked`) does not cover"""
+    tracked = set(tracked if tracked is not None else get_columnar_snapshot().ids)
+    coins = set(Portfolio.objects.values_list('cryptocurrency', flat=True).distinct())
+    coins.update(Watchlist.objects.values_list('cryptocurrency', flat=True).distinct())
+    return coins - tracked
+
+def refresh_longtail_prices(tracked: Optional[Iterable[str]] = None) -> int:
+    """Re-price the held long-tail coins in batched simple/price calls; returns the number priced.
+
+    Runs in the ingester. Unpriced and oldest quotes go first when there are
+    more coins than one token bucket's worth of batches can price. On a rate limit or upstream error the previous
+    quotes are kept, and readers see them marked stale as they age.
+    """
+    coins = held_coins(tracked)
+    quotes = caches['bulk'].get(LONGTAIL_PRICES_KEY) or {}
+    # Unpriced and oldest quotes first, in case there are more coins than one refresh can price
+    due = sorted(coins, key=lambda coin: quotes[coin][2] if coin in quotes else 0.0)
+    try:
+        data = fetch_simple_prices(due) if due else {}
+    except UpstreamRateLimited as e:
+        logger.warning(f"Long-tail price refresh deferred by rate limit ({e.retry_after:.1f}s)")
+        return 0
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Long-tail price refresh failed: {e}")
+        return 0
+    finally:
+        cache.delete(LONGTAIL_REFRESH_QUEUED_KEY)
+
+    now = time.time()
+    quotes = {coin: quote for coin, quote in quotes.items() if coin in coins}  # drop coins no longer held
+    for coin, price in data.items():
+        if price.get('usd') is not None:
+            quotes[coin] = [float(price['usd']), float(price.get('usd_24h_change') or 0.0), now]
+    caches['bulk'].set(LONGTAIL_PRICES_KEY, quotes, timeout=None)
+    logger.info(f"Refreshed long-tail prices for {len(data)}/{len(coins)} held coins")
+    return len(data)
+
+def request_longtail_refresh() -> bool:
+    """Queue a long-tail price refresh unless one is already pending"""
+    if not cache.add(LONGTAIL_REFRESH_QUEUED_KEY, 1, timeout=settings.MARKET_DATA_REFRESH_INTERVAL):
+        return False
+
+    from .tasks import refresh_longtail_prices as refresh_task
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        threading.Thread(target=refresh_task, daemon=True).start()
+    else:
+        refresh_task.delay()
+    logger.info("Queued background long-tail price refresh")
+    return True
+
+def _quotes_for(quotes: Dict[str, list], coins: Iterable[str]) -> Dict[str, Dict]:
+    now = time.time()
+    return {
+        coin: {
+            "usd": quotes[coin][0],
+            "usd_24h_change": quotes[coin][1],
+            "updated_at": quotes[coin][2],
+            "stale": now - quotes[coin][2] > _stale_after(),
+        }
+        for coin in coins if coin in quotes
+    }
+
+def get_longtail_prices(coins: Iterable[str]) -> Dict[str, Dict]:
+    """Cached quotes for coins outside the snapshot, never touching the network.
+
+    Coins without a quote yet (e.g. just added) queue a background refresh
+    and are left out; callers show them as unpriced until it lands.
+    """
+    coins = list(coins)
+    quotes = _quotes_for(caches['bulk'].get(LONGTAIL_PRICES_KEY) or {}, coins)
+    if len(quotes) < len(coins):
+        request_longtail_refresh()
+    return quotes
+
+async def aget_longtail_prices(coins: Iterable[str]) -> Dict[str, Dict]:
+    """Async get_longtail_prices()"""
+    coins = list(coins)
+    quotes = _quotes_for(await cache_aget(LONGTAIL_PRICES_KEY, alias='bulk') or {}, coins)
+    if len(quotes) < len(coins):
+        await sync_to_async(request_longtail_refresh, thread_sensitive=False)()
+    return quotes
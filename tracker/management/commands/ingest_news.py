@@ -0,0 +1,24 @@
+# tracker/management/commands/ingest_news.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tracker.news import ingest_latest_news, retag_articles
+
+class Command(BaseCommand):
+    help = 'Fetch, score and store the latest news articles (use --pages/--processes for backfills)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=settings.NEWS_INGEST_PAGES,
+                            help='NewsAPI pages of 100 articles to fetch')
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Worker processes for sentiment scoring (default NEWS_SCORING_PROCESSES)')
+        parser.add_argument('--retag', action='store_true',
+                            help='Re-tag stored articles with the current coin registry instead of fetching')
+
+    def handle(self, *args, **options):
+        if options['retag']:
+            mentions = retag_articles()
+            self.stdout.write(self.style.SUCCESS(f"Re-tagged stored articles ({mentions} coin mentions)"))
+            return
+        created = ingest_latest_news(options['pages'], options['processes'])
+        self.stdout.write(self.style.SUCCESS(f"Ingested {created} new articles"))
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0003_alter_portfolio_unique_together'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cryptoprice',
+            name='price_usd',
+            field=models.DecimalField(decimal_places=10, max_digits=30, null=True),
+        ),
+        migrations.AlterField(
+            model_name='cryptoprice',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='PriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cryptocurrency', models.CharField(max_length=100)),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('5m', '5 minutes'), ('1h', '1 hour'), ('1d', '1 day')], max_length=3)),
+                ('bucket_start', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=10, max_digits=30)),
+                ('high', models.DecimalField(decimal_places=10, max_digits=30)),
+                ('low', models.DecimalField(decimal_places=10, max_digits=30)),
+                ('close', models.DecimalField(decimal_places=10, max_digits=30)),
+                ('volume', models.DecimalField(decimal_places=2, max_digits=20, null=True)),
+                ('sample_count', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'unique_together': {('cryptocurrency', 'resolution', 'bucket_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0004_price_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, unique=True)),
+                ('title', models.CharField(max_length=500)),
+                ('description', models.TextField(blank=True)),
+                ('source', models.CharField(blank=True, max_length=200)),
+                ('published_at', models.DateTimeField(db_index=True)),
+                ('sentiment_score', models.FloatField(default=0.5)),
+                ('sentiment_label', models.CharField(default='Neutral', max_length=20)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-published_at'],
+            },
+        ),
+    ]
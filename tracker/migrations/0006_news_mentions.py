@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0005_news_articles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsarticle',
+            name='coins',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='NewsMention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cryptocurrency', models.CharField(max_length=100)),
+                ('published_at', models.DateTimeField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='tracker.newsarticle')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cryptocurrency', '-published_at'], name='tracker_new_cryptoc_45ed53_idx')],
+                'unique_together': {('cryptocurrency', 'article')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0006_news_mentions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cryptoprice',
+            name='price_usd',
+            field=models.DecimalField(decimal_places=18, max_digits=38, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pricerollup',
+            name='close',
+            field=models.DecimalField(decimal_places=18, max_digits=38),
+        ),
+        migrations.AlterField(
+            model_name='pricerollup',
+            name='high',
+            field=models.DecimalField(decimal_places=18, max_digits=38),
+        ),
+        migrations.AlterField(
+            model_name='pricerollup',
+            name='low',
+            field=models.DecimalField(decimal_places=18, max_digits=38),
+        ),
+        migrations.AlterField(
+            model_name='pricerollup',
+            name='open',
+            field=models.DecimalField(decimal_places=18, max_digits=38),
+        ),
+    ]
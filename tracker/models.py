@@ -1,20 +1,41 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from decimal import Decimal
 
 class CryptoPrice(models.Model):
     cryptocurrency = models.CharField(max_length=100)
-    price_usd = models.DecimalField(max_digits=20, decimal_places=2, null=True)
+    price_usd = models.DecimalField(max_digits=38, decimal_places=18, null=True)
     usd_24h_change = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     usd_market_cap = models.DecimalField(max_digits=20, decimal_places=2, null=True)
     usd_24h_vol = models.DecimalField(max_digits=20, decimal_places=2, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         indexes = [
             models.Index(fields=['cryptocurrency', 'timestamp']),
         ]
 
+class PriceRollup(models.Model):
+    """OHLCV candle for one coin over a fixed-size time bucket"""
+    RESOLUTION_CHOICES = [('1m', '1 minute'), ('5m', '5 minutes'), ('1h', '1 hour'), ('1d', '1 day')]
+
+    cryptocurrency = models.CharField(max_length=100)
+    resolution = models.CharField(max_length=3, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    open = models.DecimalField(max_digits=38, decimal_places=18)
+    high = models.DecimalField(max_digits=38, decimal_places=18)
+    low = models.DecimalField(max_digits=38, decimal_places=18)
+    close = models.DecimalField(max_digits=38, decimal_places=18)
+    volume = models.DecimalField(max_digits=20, decimal_places=2, null=True)
+    sample_count = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('cryptocurrency', 'resolution', 'bucket_start')
+
+    def __str__(self):
+        return f"{self.cryptocurrency} {self.resolution} @ {self.bucket_start:%Y-%m-%d %H:%M}"
+
 class Portfolio(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     cryptocurrency = models.CharField(max_length=100)
@@ -36,4 +57,34 @@ class Alert(models.Model):
     cryptocurrency = models.CharField(max_length=100)
     target_price = models.DecimalField(max_digits=20, decimal_places=2)
     condition = models.CharField(max_length=10, choices=[('above', 'Above'), ('below', 'Below')])
-    is_active = models.BooleanField(default=True)
\ No newline at end of file
+    is_active = models.BooleanField(default=True)
+
+class NewsArticle(models.Model):
+    """A news article, scored once at ingestion and keyed by its URL"""
+    url = models.URLField(max_length=500, unique=True)
+    title = models.CharField(max_length=500)
+    description = models.TextField(blank=True)
+    source = models.CharField(max_length=200, blank=True)
+    published_at = models.DateTimeField(db_index=True)
+    sentiment_score = models.FloatField(default=0.5)
+    sentiment_label = models.CharField(max_length=20, default='Neutral')
+    coins = models.JSONField(default=list, blank=True)  # IDs of the coins the article mentions
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-published_at']
+
+    def __str__(self):
+        return self.title
+
+class NewsMention(models.Model):
+    """Inverted index entry: one coin mentioned by one article"""
+    article = models.ForeignKey(NewsArticle, on_delete=models.CASCADE, related_name='mentions')
+    cryptocurrency = models.CharField(max_length=100)
+    published_at = models.DateTimeField()  # copied from the article so per-coin lookups stay on the index
+
+    class Meta:
+        unique_together = ('cryptocurrency', 'article')
+        indexes = [
+            models.Index(fields=['cryptocurrency', '-published_at']),
+        ]
@@ -0,0 +1,353 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .coins import get_coin_registry
+from .localcache import local_cache
+from .models import NewsArticle, NewsMention
+from .snapshots import (
+    get_columnar_snapshot, get_snapshot_version, publish_coin_sentiment, publish_market_api_body,
+    publish_market_sentiment,
+)
+from .utils import fetch_news
+
+logger = logging.getLogger(__name__)
+
+try:
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    VADER_AVAILABLE = True
+except ImportError:
+    VADER_AVAILABLE = False
+    logger.warning("vaderSentiment not installed. Sentiment analysis disabled.")
+
+NEUTRAL_SCORE = 0.5
+MIN_TEXT_LENGTH = 10
+PARALLEL_MIN_TEXTS = 2000  # below this a process pool costs more to start than it saves
+NEWS_INGEST_QUEUED_KEY = 'news_ingest_queued'
+NEWS_INGESTED_AT_KEY = 'news_ingested_at'
+NEWS_SENTIMENT_AGGREGATE_KEY = 'news_sentiment_aggregate'
+MIN_SENTIMENT_WEIGHT = 0.1  # decayed article weight below which a coin's sentiment reverts to Neutral
+REBUILD_HALF_LIVES = 5  # articles older than this many half-lives add under 4% weight
+
+def sentiment_label(score: float) -> str:
+    return ("Very Positive" if score > 0.65 else "Positive" if score > 0.55 else "Neutral" if score > 0.45
+            else "Negative" if score > 0.35 else "Very Negative")
+
+# ------------------ Scoring ------------------
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+def get_analyzer():
+    """This process's VADER analyzer, created on first use (loading the lexicon is the expensive part)"""
+    global _analyzer
+    if _analyzer is None and VADER_AVAILABLE:
+        with _analyzer_lock:
+            if _analyzer is None:
+                _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+def _score_batch(texts: Sequence[str]) -> List[float]:
+    """Scores in [0, 1] for a batch of texts; module-level so pool workers can run it"""
+    analyzer = get_analyzer()
+    scores = []
+    for text in texts:
+        if analyzer is None or not text or len(text.strip()) < MIN_TEXT_LENGTH:
+            scores.append(NEUTRAL_SCORE)
+        else:
+            scores.append(round((analyzer.polarity_scores(text)['compound'] + 1) / 2, 3))
+    return scores
+
+def score_texts(texts: Sequence[str], processes: Optional[int] = None) -> List[float]:
+    """Sentiment scores in [0, 1] for many texts, in order.
+
+    Batches run on this process's shared analyzer. Large backfills can be
+    split over a process pool instead, where each worker loads the lexicon
+    once; if a pool cannot be started (e.g. inside a daemonic Celery worker)
+    scoring falls back to this process.
+    """
+    texts = list(texts)
+    if processes is None:
+        processes = getattr(settings, 'NEWS_SCORING_PROCESSES', 0)
+    if processes > 1 and len(texts) >= PARALLEL_MIN_TEXTS:
+        size = -(-len(texts) // processes)
+        try:
+            with ProcessPoolExecutor(processes) as pool:
+                batches = pool.map(_score_batch, [texts[i:i + size] for i in range(0, len(texts), size)])
+                return [score for batch in batches for score in batch]
+        except Exception as e:
+            logger.warning(f"Process pool scoring unavailable ({e}), scoring in-process")
+    return _score_batch(texts)
+
+# ------------------ Ingestion ------------------
+
+def _article_fields(article: Dict) -> Optional[Dict]:
+    """Model fields for a raw NewsAPI article (None for unusable or removed articles)"""
+    url = (article.get('url') or '').strip()
+    title = (article.get('title') or '').strip()
+    published_at = parse_datetime(article.get('publishedAt') or '')
+    if not url or not title or title == '[Removed]' or published_at is None:
+        return None
+    return {
+        'url': url[:500],
+        'title': title[:500],
+        'description': article.get('description') or '',
+        'source': ((article.get('source') or {}).get('name') or '')[:200],
+        'published_at': published_at,
+    }
+
+def ingest_articles(raw_articles: Iterable[Dict], processes: Optional[int] = None) -> List[NewsArticle]:
+    """Store and score the articles not seen before; returns the newly created rows.
+
+    Articles are keyed by URL, so anything already stored is skipped before
+    scoring and never scored twice.
+    """
+    fresh: Dict[str, Dict] = {}
+    for article in raw_articles:
+        fields = _article_fields(article)
+        if fields and fields['url'] not in fresh:
+            fresh[fields['url']] = fields
+    if not fresh:
+        return []
+
+    known = set(NewsArticle.objects.filter(url__in=list(fresh)).values_list('url', flat=True))
+    new = [fields for url, fields in fresh.items() if url not in known]
+    if not new:
+        return []
+
+    texts = [f"{fields['title']} {fields['description']}" for fields in new]
+    scores = score_texts(texts, processes)
+    matcher = get_coin_matcher()
+    now = timezone.now()
+    articles = [
+        NewsArticle(**fields, sentiment_score=score, sentiment_label=sentiment_label(score),
+                    coins=sorted(matcher.mentions(text)), fetched_at=now)
+        for fields, score, text in zip(new, scores, texts)
+    ]
+    NewsArticle.objects.bulk_create(articles, ignore_conflicts=True, batch_size=500)
+    index_mentions(articles)
+    logger.info(f"Ingested {len(articles)} new articles ({len(known)} already stored)")
+    return articles
+
+def index_mentions(articles: Sequence[NewsArticle]) -> int:
+    """Add the articles' coin tags to the coin -> article inverted index"""
+    # bulk_create(ignore_conflicts=True) leaves primary keys unset, so look them up by URL
+    ids = dict(NewsArticle.objects.filter(url__in=[article.url for article in articles]).values_list('url', 'id'))
+    mentions = [
+        NewsMention(article_id=ids[article.url], cryptocurrency=coin_id, published_at=article.published_at)
+        for article in articles if article.url in ids
+        for coin_id in article.coins
+    ]
+    NewsMention.objects.bulk_create(mentions, ignore_conflicts=True, batch_size=1000)
+    return len(mentions)
+
+def retag_articles() -> int:
+    """Re-tag every stored article with the current matcher and rebuild the inverted index"""
+    matcher = get_coin_matcher()
+    articles = list(NewsArticle.objects.all())
+    for article in articles:
+        article.coins = sorted(matcher.mentions(f"{article.title} {article.description}"))
+    NewsArticle.objects.bulk_update(articles, ['coins'], batch_size=500)
+    NewsMention.objects.all().delete()
+    count = index_mentions(articles)
+    cache.delete(NEWS_SENTIMENT_AGGREGATE_KEY)  # rebuilt from the new tags
+    update_sentiment_aggregate([])
+    logger.info(f"Re-tagged {len(articles)} articles ({count} coin mentions)")
+    return count
+
+def ingest_latest_news(pages: Optional[int] = None, processes: Optional[int] = None, retry_attempt: int = 0) -> int:
+    """Pull the latest articles from NewsAPI and ingest them; returns the number of new articles"""
+    raw_articles = fetch_news(pages or settings.NEWS_INGEST_PAGES, fallback=False, _retry_attempt=retry_attempt) or []
+    created = ingest_articles(raw_articles, processes)
+    update_sentiment_aggregate(created)
+    cutoff = timezone.now() - timedelta(days=settings.NEWS_RETENTION_DAYS)
+    NewsArticle.objects.filter(published_at__lt=cutoff).delete()
+    cache.set(NEWS_INGESTED_AT_KEY, time.time(), timeout=None)
+    cache.delete(NEWS_INGEST_QUEUED_KEY)
+    return len(created)
+
+def request_news_ingest() -> bool:
+    """Queue a news ingestion unless one ran recently or is already pending"""
+    ingested_at = cache.get(NEWS_INGESTED_AT_KEY)
+    if ingested_at and time.time() - ingested_at < settings.NEWS_INGEST_INTERVAL:
+        return False
+    if not cache.add(NEWS_INGEST_QUEUED_KEY, 1, timeout=settings.NEWS_INGEST_INTERVAL):
+        return False
+
+    from .tasks import ingest_news
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        threading.Thread(target=ingest_news, daemon=True).start()
+    else:
+        ingest_news.delay()
+    logger.info("Queued background news ingestion")
+    return True
+
+# ------------------ Coin mentions ------------------
+
+_TOKEN_RE = re.compile(r"\$?[A-Za-z0-9]+(?:[.-][A-Za-z0-9]+)*")
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text)
+
+class CoinMatcher:
+    """Finds the coins a text mentions, by name or by ticker symbol.
+
+    Multi-word names match case-insensitively as whole-word sequences
+    (longest first, so "Bitcoin Cash" is not also Bitcoin). One-word names
+    only match when capitalised, since many are ordinary words ("Core",
+    "Flow", "Maker"). Symbols match when written in capitals (3+ characters)
+    or with a $ prefix. Long-tail coins (`others`) only match by $ticker:
+    their names are mostly ordinary words or phrases ("Gold", "Price Action",
+    "Federal Reserve"), even when capitalised. Lookups are hash probes per
+    token, so cost depends on the text length, not the number of coins.
+    """
+
+    def __init__(self, coins: Iterable[Tuple[str, str, str]], others: Iterable[Tuple[str, str, str]] = ()):
+        self.names: Dict[Tuple[str, ...], str] = {}  # multi-word names
+        self.words: Dict[str, str] = {}  # one-word names, capitalised only
+        self.symbols: Dict[str, str] = {}
+        self.tickers: Dict[str, str] = {}  # $-prefixed only
+        # Coins come best-ranked first, so the first coin keeps a shared name or symbol
+        for coin_id, symbol, name in coins:
+            words = tuple(token.lower() for token in _tokens(name))
+            if len(words) > 1:
+                self.names.setdefault(words, coin_id)
+            elif words and len(words[0]) >= 3:
+                self.words.setdefault(words[0], coin_id)
+            if symbol:
+                self.symbols.setdefault(symbol.upper(), coin_id)
+                self.tickers.setdefault(symbol.upper(), coin_id)
+        for coin_id, symbol, _ in others:
+            if symbol:
+                self.tickers.setdefault(symbol.upper(), coin_id)
+        self.max_words = max((len(words) for words in self.names), default=2)
+
+    def mentions(self, text: str) -> Set[str]:
+        tokens = _tokens(text or '')
+        lowered = [token.lower() for token in tokens]
+        found = set()
+        position = 0
+        while position < len(tokens):
+            token = tokens[position]
+            for length in range(min(self.max_words, len(tokens) - position), 1, -1):
+                coin_id = self.names.get(tuple(lowered[position:position + length]))
+                if coin_id:
+                    found.add(coin_id)
+                    position += length
+                    break
+            else:
+                if token[0].isupper() and lowered[position] in self.words:
+                    coin_id = self.words[lowered[position]]
+                elif token.startswith('$'):
+                    coin_id = self.tickers.get(token[1:].upper())
+                elif len(token) >= 3 and token.isupper():
+                    coin_id = self.symbols.get(token)
+                else:
+                    coin_id = None
+                if coin_id:
+                    found.add(coin_id)
+                position += 1
+        return found
+
+def get_coin_matcher() -> CoinMatcher:
+    """Matcher over the coin registry, with the tracked (snapshot) coins first.
+
+    Built once per registry and snapshot version in each process.
+    """
+    registry = get_coin_registry()
+
+    def build():
+        columns = get_columnar_snapshot()
+        others = ((coin_id, symbol, name) for coin_id, (symbol, name) in registry.coins.items()
+                  if coin_id not in columns)
+        return CoinMatcher(zip(columns.ids, columns.text['symbol'], columns.text['name']), others)
+    return local_cache.get_or_load(('coin_matcher', registry.version, get_snapshot_version()), build)
+
+# ------------------ Sentiment aggregate ------------------
+
+def _decay(age: float) -> float:
+    return 0.5 ** (max(age, 0.0) / settings.NEWS_SENTIMENT_HALF_LIFE)
+
+def _sentiment(score_sum: float, weight: float) -> Dict[str, object]:
+    if weight < MIN_SENTIMENT_WEIGHT:
+        return {"score": NEUTRAL_SCORE, "label": "Neutral"}
+    score = score_sum / weight
+    return {"score": round(score, 3), "label": sentiment_label(score)}
+
+def update_sentiment_aggregate(articles: Iterable[NewsArticle]) -> Dict[str, object]:
+    """Fold newly ingested articles into the running, time-decayed sentiment and publish it.
+
+    The aggregate keeps decayed (score x weight, weight) sums for the market
+    and for every mentioned coin. Decay scales all weights alike, so an
+    update only rescales the old sums and adds the new articles; nothing is
+    re-read. A missing aggregate is rebuilt from the stored recent articles.
+    Returns the market sentiment.
+    """
+    now = time.time()
+    aggregate = cache.get(NEWS_SENTIMENT_AGGREGATE_KEY)
+    if aggregate is None:
+        since = timezone.now() - timedelta(seconds=settings.NEWS_SENTIMENT_HALF_LIFE * REBUILD_HALF_LIVES)
+        articles = NewsArticle.objects.filter(published_at__gte=since)
+        aggregate = {'as_of': now, 'market': (0.0, 0.0), 'coins': {}}
+
+    factor = _decay(now - aggregate['as_of'])
+    market = [value * factor for value in aggregate['market']]
+    coins = {coin_id: [score_sum * factor, weight * factor] for coin_id, (score_sum, weight) in aggregate['coins'].items()}
+    for article in articles:
+        weight = _decay(now - article.published_at.timestamp())
+        market[0] += article.sentiment_score * weight
+        market[1] += weight
+        for coin_id in article.coins:
+            sums = coins.setdefault(coin_id, [0.0, 0.0])
+            sums[0] += article.sentiment_score * weight
+            sums[1] += weight
+
+    coins = {coin_id: tuple(sums) for coin_id, sums in coins.items() if sums[1] >= MIN_SENTIMENT_WEIGHT}
+    cache.set(NEWS_SENTIMENT_AGGREGATE_KEY, {'as_of': now, 'market': tuple(market), 'coins': coins}, timeout=None)
+
+    sentiment = _sentiment(*market)
+    publish_market_sentiment(sentiment)
+    publish_coin_sentiment({coin_id: _sentiment(*sums)['label'] for coin_id, sums in coins.items()})
+    publish_market_api_body(sentiment)
+    logger.info(f"Market sentiment {sentiment['label']} ({sentiment['score']}), {len(coins)} coins with news")
+    return sentiment
+
+# ------------------ Reading ------------------
+
+async def aget_recent_articles(limit: int = 50) -> List[NewsArticle]:
+    return [article async for article in NewsArticle.objects.all()[:limit]]
+
+def _coin_mentions(coin_ids: List[str], limit: int):
+    # An article can mention several of the coins, so read enough rows to fill `limit` after de-duplication
+    return (NewsMention.objects.filter(cryptocurrency__in=coin_ids).order_by('-published_at')
+            .values_list('article_id', flat=True)[:limit * len(coin_ids)])
+
+def _first_unique(article_ids: Iterable[int], limit: int) -> List[int]:
+    return list(dict.fromkeys(article_ids))[:limit]
+
+def get_coin_news(coin_ids: Iterable[str], limit: int = 10) -> List[NewsArticle]:
+    """Latest articles mentioning any of the coins, newest first, from the inverted index"""
+    coin_ids = list(coin_ids)
+    if not coin_ids:
+        return []
+    article_ids = _first_unique(_coin_mentions(coin_ids, limit), limit)
+    articles = NewsArticle.objects.in_bulk(article_ids)
+    return [articles[article_id] for article_id in article_ids if article_id in articles]
+
+async def aget_coin_news(coin_ids: Iterable[str], limit: int = 10) -> List[NewsArticle]:
+    """Async get_coin_news()"""
+    coin_ids = list(coin_ids)
+    if not coin_ids:
+        return []
+    article_ids = _first_unique([article_id async for article_id in _coin_mentions(coin_ids, limit)], limit)
+    articles = await NewsArticle.objects.ain_bulk(article_ids)
+    return [articles[article_id] for article_id in article_ids if article_id in articles]
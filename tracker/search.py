@@ -0,0 +1,173 @@
+import heapq
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .coins import get_coin_registry
+from .snapshots import get_columnar_snapshot, get_market_snapshot, get_snapshot_version
+
+logger = logging.getLogger(__name__)
+
+MIN_FUZZY_SCORE = 0.35
+UNRANKED = 1 << 30
+SCAN_LIMIT = 1024  # longest run of sorted terms ranked directly; longer runs walk the coins in rank order
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class CoinSearchIndex:
+    """Prefix and trigram index over coin IDs, symbols and names.
+
+    Prefix matches come from a sorted array of search terms (bisect, then a
+    contiguous scan); when those run short, trigram postings supply fuzzy
+    matches for typos. Results are ranked by market-cap rank.
+
+    A short prefix or a common word ("t", "token") can match thousands of
+    terms. Those runs are not scanned: the coins are walked best-ranked
+    first instead, stopping as soon as enough of them match.
+    """
+
+    def __init__(self, coins: Iterable[Tuple[str, str, str]], source=None):
+        self.source = source
+        self.ids: List[str] = []
+        entries = []
+        self.haystacks: List[str] = []  # "\0term\0term\0" per coin, for substring tests while walking
+        self.trigrams: Dict[str, List[int]] = {}
+        for index, (coin_id, symbol, name) in enumerate(coins):
+            self.ids.append(coin_id)
+            terms = {term for term in (coin_id, symbol.lower(), name.lower(), *name.lower().split()) if term}
+            entries.extend((term, index) for term in terms)
+            self.haystacks.append('\0' + '\0'.join(terms) + '\0')
+            for trigram in _trigrams(coin_id) | _trigrams(name.lower()):
+                self.trigrams.setdefault(trigram, []).append(index)
+        entries.sort()
+        self.terms = [term for term, _ in entries]
+        self.term_coins = [index for _, index in entries]
+        # Unranked coins tie-break on ID length, then ID, which never changes
+        self.unranked_order = sorted(range(len(self.ids)), key=lambda i: (len(self.ids[i]), self.ids[i]))
+        self.ranks: List[int] = [UNRANKED] * len(self.ids)
+        self.ranks_version = None
+        self._set_order(self.unranked_order)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _set_order(self, order: List[int]) -> None:
+        self.order = order  # coin indexes, best-ranked first
+        self.positions = [0] * len(order)
+        for position, index in enumerate(order):
+            self.positions[index] = position
+
+    def set_ranks(self, coin_ranks: Dict[str, int], version) -> None:
+        self.ranks = [coin_ranks.get(coin_id, UNRANKED) for coin_id in self.ids]
+        ranks = self.ranks
+        ranked = sorted((i for i, rank in enumerate(ranks) if rank < UNRANKED),
+                        key=lambda i: (ranks[i], len(self.ids[i]), self.ids[i]))
+        self._set_order(ranked + [i for i in self.unranked_order if ranks[i] == UNRANKED])
+        self.ranks_version = version
+
+    def _best(self, indexes, limit: int) -> List[int]:
+        return heapq.nsmallest(limit, indexes, key=self.positions.__getitem__)
+
+    def _walk(self, matches: Callable[[int], bool], limit: int) -> List[int]:
+        """First `limit` coins in rank order that satisfy matches"""
+        return list(islice(filter(matches, self.order), limit))
+
+    def _prefix_matches(self, query: str, limit: int) -> List[int]:
+        """Best `limit` coin indexes with a term equal to query (first) or starting with it"""
+        start = bisect_left(self.terms, query)
+        exact_end = bisect_right(self.terms, query, start)
+        end = bisect_left(self.terms, query + '\U0010ffff', exact_end)
+        haystacks = self.haystacks
+
+        if exact_end - start > SCAN_LIMIT:
+            needle = f"\0{query}\0"
+            results = self._walk(lambda i: needle in haystacks[i], limit)
+            exact = set(results)  # every exact match whenever the walk falls short of limit
+        else:
+            exact = set(self.term_coins[start:exact_end])
+            results = self._best(exact, limit)
+        if len(results) < limit and end > exact_end:
+            if end - exact_end > SCAN_LIMIT:
+                needle = f"\0{query}"
+                results += self._walk(lambda i: needle in haystacks[i] and i not in exact, limit - len(results))
+            else:
+                results += self._best(set(self.term_coins[exact_end:end]) - exact, limit - len(results))
+        return results
+
+    def _fuzzy_matches(self, query: str, exclude) -> Dict[int, float]:
+        query_trigrams = _trigrams(query)
+        counts: Dict[int, int] = {}
+        for trigram in query_trigrams:
+            for index in self.trigrams.get(trigram, ()):
+                counts[index] = counts.get(index, 0) + 1
+        return {
+            index: count / len(query_trigrams)
+            for index, count in counts.items()
+            if index not in exclude and count / len(query_trigrams) >= MIN_FUZZY_SCORE
+        }
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        query = query.strip().lower()
+        if not query or not self.ids:
+            return []
+        ranks = self.ranks
+        results = self._prefix_matches(query, limit)
+        if len(results) < limit and len(query) >= 3:
+            # Falling short means every prefix match is already in results
+            fuzzy = self._fuzzy_matches(query, set(results))
+            results += heapq.nsmallest(limit - len(results), fuzzy,
+                                       key=lambda i: (-round(fuzzy[i], 1), ranks[i], self.ids[i]))
+        return [self.ids[index] for index in results]
+
+# ------------------ Process-local index ------------------
+
+_index: Optional[CoinSearchIndex] = None
+_index_lock = threading.Lock()
+
+def get_search_index() -> CoinSearchIndex:
+    """Return the search index, rebuilding it only when the coin registry changes.
+
+    Until the registry has been loaded the index covers the market snapshot
+    coins instead. Market-cap ranks are refreshed per snapshot version.
+    """
+    global _index
+    registry = get_coin_registry()
+    snapshot_version = get_snapshot_version()
+    source = ('registry', registry.version) if registry else ('snapshot', snapshot_version)
+
+    with _index_lock:
+        if _index is None or _index.source != source:
+            if registry:
+                coins = ((coin_id, symbol, name) for coin_id, (symbol, name) in registry.coins.items())
+            else:
+                coins = ((coin_id, data.get('symbol', ''), data.get('name', ''))
+                         for coin_id, data in get_market_snapshot().items())
+            _index = CoinSearchIndex(coins, source)
+            logger.info(f"Built coin search index from {source[0]} v{source[1]} ({len(_index)} coins)")
+        if _index.ranks_version != snapshot_version:
+            _index.set_ranks(get_columnar_snapshot().ranks(), snapshot_version)
+        return _index
+
+def search_coins(query: str, limit: int = 20) -> List[str]:
+    """Coin IDs matching an ID, symbol or name prefix (or a close misspelling), best-ranked first"""
+    return get_search_index().search(query, limit)
+
+def suggest_coins(query: str, limit: int = 10) -> List[Dict]:
+    """Lightweight typeahead rows (id, symbol, name, price) for the best matches"""
+    registry = get_coin_registry()
+    market_data = get_market_snapshot()
+    suggestions = []
+    for coin_id in search_coins(query, limit):
+        data = market_data.get(coin_id, {})
+        symbol, name = registry.coins.get(coin_id) or (data.get('symbol', ''), data.get('name', ''))
+        suggestions.append({
+            "id": coin_id,
+            "symbol": symbol.upper(),
+            "name": name,
+            "usd": data.get("usd"),
+        })
+    return suggestions
@@ -0,0 +1,26 @@
+import json
+import logging
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Optional fast JSON encoder; falls back to the standard library when missing
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def _json_default(value):
+    if hasattr(value, 'tolist'):  # NumPy scalars and arrays
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def json_bytes(value: Any) -> bytes:
+    """Encode a value as compact JSON bytes (orjson when installed)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_json_default, separators=(',', ':')).encode()
+
+def json_text(value: Any) -> str:
+    return json_bytes(value).decode()
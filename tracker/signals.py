@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .alert_engine import bump_alerts_version
+from .models import Alert, Portfolio
+from .valuation import invalidate_portfolio_valuation
+
+@receiver([post_save, post_delete], sender=Alert)
+def invalidate_alert_books(sender, **kwargs):
+    bump_alerts_version()
+
+@receiver([post_save, post_delete], sender=Portfolio)
+def invalidate_portfolio_summary(sender, instance, **kwargs):
+    invalidate_portfolio_valuation(instance.user_id)
@@ -0,0 +1,264 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .asynccache import cache_aget
+from .columnar import ColumnarSnapshot
+from .localcache import local_cache
+from .serialization import json_bytes
+
+logger = logging.getLogger(__name__)
+
+MARKET_SNAPSHOT_KEY = 'market_snapshot:{version}'
+MARKET_SNAPSHOT_VIEW_KEY = 'market_snapshot:{version}:{name}'
+MARKET_SNAPSHOT_POINTER_KEY = 'market_snapshot:current'
+MARKET_SNAPSHOT_SEQ_KEY = 'market_snapshot:seq'
+MARKET_SENTIMENT_KEY = 'market_sentiment'
+COIN_SENTIMENT_KEY = 'coin_sentiment'
+REFRESH_QUEUED_KEY = 'market_data_refresh_queued'
+MARKET_DATA_JSON_VIEW = 'market_data_json'
+MARKET_API_POINTER_KEY = 'market_api:current'
+MARKET_API_BODY_KEY = 'market_api:body:{etag}'
+
+class FrozenDict(dict):
+    """A dict that refuses in-place changes; snapshot data is shared by every reader"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Market snapshots are read-only; copy the data before changing it")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (dict, (dict(self),))  # cached and pickled copies are plain dicts
+
+def freeze(data: Dict) -> FrozenDict:
+    """Read-only view of a snapshot (the per-coin rows are frozen too)"""
+    return FrozenDict((key, FrozenDict(value) if isinstance(value, dict) else value) for key, value in data.items())
+
+# ------------------ Publishing ------------------
+
+def _retention() -> int:
+    # Superseded versions stay readable for a while so in-flight readers and deltas can use them
+    return settings.MARKET_DATA_REFRESH_INTERVAL * 3
+
+def publish_market_snapshot(market_data: Dict) -> int:
+    """Store a freshly ingested market snapshot under a new version and point readers at it.
+
+    The data (and its pre-encoded JSON) is written under its own keys first,
+    so readers following the pointer never see a half-published snapshot.
+    """
+    cache.add(MARKET_SNAPSHOT_SEQ_KEY, 0, timeout=None)
+    version = cache.incr(MARKET_SNAPSHOT_SEQ_KEY)
+    previous = cache.get(MARKET_SNAPSHOT_POINTER_KEY)
+    cache.set(MARKET_SNAPSHOT_KEY.format(version=version), ColumnarSnapshot.from_dict(market_data).to_bytes(),
+              timeout=None)
+    set_snapshot_view(MARKET_DATA_JSON_VIEW, version, json_bytes(market_data))
+    cache.set(MARKET_SNAPSHOT_POINTER_KEY, {'version': version, 'timestamp': time.time()}, timeout=None)
+    if previous:
+        cache.touch(MARKET_SNAPSHOT_KEY.format(version=previous['version']), timeout=_retention())
+    cache.delete(REFRESH_QUEUED_KEY)
+    logger.info(f"Published market snapshot v{version} ({len(market_data)} coins)")
+    return version
+
+def publish_market_sentiment(sentiment: Dict) -> None:
+    """Store the sentiment computed by the ingester for request-time reads"""
+    cache.set(MARKET_SENTIMENT_KEY, sentiment, timeout=None)
+
+def publish_coin_sentiment(labels: Dict[str, str]) -> None:
+    """Store the per-coin sentiment labels (coins with recent news only) for the next market refresh"""
+    cache.set(COIN_SENTIMENT_KEY, labels, timeout=None)
+
+# ------------------ Reading ------------------
+
+def _get_pointer() -> Dict:
+    return cache.get(MARKET_SNAPSHOT_POINTER_KEY) or {}
+
+def get_snapshot_version() -> int:
+    """Return the version of the current market snapshot (0 if none yet)"""
+    return _get_pointer().get('version', 0)
+
+def get_snapshot_age() -> Optional[float]:
+    """Seconds since the current snapshot was published"""
+    timestamp = _get_pointer().get('timestamp')
+    return time.time() - timestamp if timestamp else None
+
+def _load_columns(pointer: Dict) -> Optional[ColumnarSnapshot]:
+    """Columnar snapshot for a pointer, kept in the process-local L1 after the first read.
+
+    Versions are immutable, so the L1 entry is valid for as long as the pointer
+    names it; the publish timestamp in the key guards against version numbers
+    restarting after the shared cache is cleared.
+    """
+    version = pointer.get('version')
+    if not version:
+        return None
+
+    def load():
+        payload = cache.get(MARKET_SNAPSHOT_KEY.format(version=version))
+        if payload is None:
+            return None
+        if isinstance(payload, dict):  # written before snapshots were stored in columnar form
+            return ColumnarSnapshot.from_dict(payload)
+        return ColumnarSnapshot.from_bytes(payload)
+    return local_cache.get_or_load(('market_columns', version, pointer.get('timestamp')), load)
+
+def _load_snapshot(pointer: Dict) -> Optional[FrozenDict]:
+    """Read-only dict form of the snapshot, materialized once per version per process"""
+    def load():
+        columns = _load_columns(pointer)
+        return freeze(columns.to_dict()) if columns is not None else None
+    return local_cache.get_or_load(('market_snapshot', pointer.get('version'), pointer.get('timestamp')), load)
+
+def read_snapshot() -> Tuple[int, Optional[FrozenDict]]:
+    """(version, read-only data) for the current snapshot; data is None if there is none"""
+    pointer = _get_pointer()
+    return pointer.get('version', 0), _load_snapshot(pointer)
+
+def get_market_snapshot() -> FrozenDict:
+    """Return the latest market snapshot without touching the network.
+
+    Only the small pointer key is read from the shared cache on the hot path.
+    A missing or stale snapshot schedules a background refresh and the
+    caller gets whatever is available right now (fallback data if nothing).
+    """
+    pointer = _get_pointer()
+    market_data = _load_snapshot(pointer)
+    age = time.time() - pointer['timestamp'] if pointer.get('timestamp') else None
+    if not market_data or age is None or age > settings.MARKET_DATA_REFRESH_INTERVAL * 2:
+        request_market_refresh()
+    if market_data:
+        return market_data
+
+    from .utils import _get_fallback_data
+    return freeze(_get_fallback_data('fetch_market_data') or {})
+
+async def aget_market_snapshot() -> FrozenDict:
+    """Async get_market_snapshot(): one awaited pointer read, the data from the L1 when warm.
+
+    Cold or stale snapshots take the sync path in the thread pool, which
+    decodes the data and schedules a refresh.
+    """
+    pointer = await cache_aget(MARKET_SNAPSHOT_POINTER_KEY) or {}
+    market_data = local_cache.get(('market_snapshot', pointer.get('version'), pointer.get('timestamp')))
+    age = time.time() - pointer['timestamp'] if pointer.get('timestamp') else None
+    if market_data is None or age is None or age > settings.MARKET_DATA_REFRESH_INTERVAL * 2:
+        return await sync_to_async(get_market_snapshot, thread_sensitive=False)()
+    return market_data
+
+def get_market_snapshot_json() -> bytes:
+    """The current snapshot as JSON bytes, encoded once at publish time"""
+    return get_snapshot_view(MARKET_DATA_JSON_VIEW, lambda market_data, version: json_bytes(market_data))
+
+# ------------------ API body ------------------
+
+def publish_market_api_body(sentiment: Dict) -> str:
+    """Materialize the /api/market-data/ response for the current snapshot and sentiment.
+
+    The body is stored under its content hash, which doubles as a strong ETag;
+    a small pointer names the current one. Returns the ETag.
+    """
+    return _store_market_api_body(sentiment)[0]
+
+def _store_market_api_body(sentiment: Dict) -> Tuple[str, Optional[float], bytes]:
+    pointer = _get_pointer()
+    body = b'{"market_data":' + get_market_snapshot_json() + b',"sentiment":' + json_bytes(sentiment) + b'}'
+    etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+    cache.set(MARKET_API_BODY_KEY.format(etag=etag), body, timeout=_retention())
+    cache.set(MARKET_API_POINTER_KEY, {'etag': etag, 'timestamp': pointer.get('timestamp')}, timeout=None)
+    return etag, pointer.get('timestamp'), body
+
+def get_market_api_body() -> Tuple[str, Optional[float], bytes]:
+    """(ETag, snapshot timestamp, body) of the current /api/market-data/ response.
+
+    Bodies are immutable per ETag, so after the first read a worker serves
+    them from its L1; a missing pointer or an evicted body is rebuilt from
+    the current snapshot and returned directly.
+    """
+    api = cache.get(MARKET_API_POINTER_KEY)
+    if api:
+        body = local_cache.get_or_load(('market_api_body', api['etag']),
+                                       lambda: cache.get(MARKET_API_BODY_KEY.format(etag=api['etag'])))
+        if body is not None:
+            return api['etag'], api['timestamp'], body
+    etag, published_at, body = _store_market_api_body(get_market_sentiment())
+    local_cache.set(('market_api_body', etag), body)
+    return etag, published_at, body
+
+async def aget_market_api_body() -> Tuple[str, Optional[float], bytes]:
+    """Async get_market_api_body(); a warm worker answers with one awaited pointer read"""
+    api = await cache_aget(MARKET_API_POINTER_KEY)
+    if api:
+        key = ('market_api_body', api['etag'])
+        body = local_cache.get(key)
+        if body is None:
+            body = await cache_aget(MARKET_API_BODY_KEY.format(etag=api['etag']))
+            if body is not None:
+                local_cache.set(key, body)
+        if body is not None:
+            return api['etag'], api['timestamp'], body
+    return await sync_to_async(get_market_api_body, thread_sensitive=False)()
+
+def seconds_until_refresh(published_at: Optional[float]) -> int:
+    """Seconds until the snapshot published at `published_at` is due to be replaced"""
+    if not published_at:
+        return 0  # nothing published yet, so a refresh is already pending
+    return max(0, int(settings.MARKET_DATA_REFRESH_INTERVAL - (time.time() - published_at)))
+
+def get_columnar_snapshot() -> ColumnarSnapshot:
+    """The current snapshot as NumPy columns, for sorting, top-N and aggregate queries"""
+    columns = _load_columns(_get_pointer())
+    if columns is None:
+        return ColumnarSnapshot.from_dict(get_market_snapshot())
+    return columns
+
+def get_snapshot_view(name: str, build: Callable[[FrozenDict, int], Any]) -> Any:
+    """Value derived from the current snapshot, computed once per version and shared via the cache.
+
+    `build(market_data, version)` runs only on the first read after a new
+    snapshot is published; the result is stored next to the snapshot and
+    kept in the process-local L1.
+    """
+    pointer = _get_pointer()
+    version = pointer.get('version', 0)
+
+    def load():
+        value = cache.get(MARKET_SNAPSHOT_VIEW_KEY.format(version=version, name=name))
+        if value is None:
+            market_data = _load_snapshot(pointer)
+            value = build(market_data if market_data is not None else get_market_snapshot(), version)
+            set_snapshot_view(name, version, value)
+        return value
+    return local_cache.get_or_load(('market_snapshot_view', name, version, pointer.get('timestamp')), load)
+
+def set_snapshot_view(name: str, version: int, value: Any) -> None:
+    """Store a derived value for a snapshot version (e.g. precomputed by the ingester)"""
+    cache.set(MARKET_SNAPSHOT_VIEW_KEY.format(version=version, name=name), value, timeout=_retention())
+
+def get_market_sentiment() -> Dict:
+    """Return the last published market sentiment without touching the network"""
+    return cache.get(MARKET_SENTIMENT_KEY) or {"score": 0.5, "label": "Neutral"}
+
+def get_coin_sentiment() -> Dict[str, str]:
+    """coin ID -> sentiment label for the coins mentioned in recent news"""
+    return cache.get(COIN_SENTIMENT_KEY) or {}
+
+def request_market_refresh() -> bool:
+    """Queue a market data refresh unless one is already pending"""
+    if not cache.add(REFRESH_QUEUED_KEY, 1, timeout=settings.MARKET_DATA_REFRESH_INTERVAL):
+        return False
+
+    from .tasks import update_market_data
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        # Eager mode would run the task inside the request, so hand it to a thread instead
+        threading.Thread(target=update_market_data, daemon=True).start()
+    else:
+        update_market_data.delay()
+    logger.info("Queued background market data refresh")
+    return True
@@ -1,21 +1,66 @@
-import requests
-from django.conf import settings
-from tracker.models import CryptoPrice
+import logging
+
+from tracker.alert_engine import evaluate_alerts
+from tracker.broadcast import broadcast_market_snapshot
+from tracker.coins import publish_coin_registry
+from tracker.columnar import ColumnarSnapshot
+from tracker.longtail import refresh_longtail_prices as refresh_longtail_quotes
+from tracker.news import ingest_latest_news, request_news_ingest
+from tracker.snapshots import (
+    get_market_sentiment, get_snapshot_version, publish_market_api_body, publish_market_snapshot,
+    read_snapshot,
+)
+from tracker.timeseries import record_market_snapshot
+from tracker.utils import fetch_coin_list, fetch_market_data
 from celery import shared_task
 
-@shared_task
-def fetch_crypto_prices():
-    url = "https://api.coingecko.com/api/v3/simple/price"
-    params = {
-        'ids': 'bitcoin,ethereum',  # Add more cryptocurrencies as needed
-        'vs_currencies': 'usd',
-        'x_cg_demo_api_key': settings.COINGECKO_API_KEY
-    }
-    response = requests.get(url, params=params)
-    data = response.json()
+logger = logging.getLogger(__name__)
+
+@shared_task(ignore_result=True)
+def update_market_data(retry_attempt=0):
+    """Fetch market data from CoinGecko, publish it as a new snapshot and push it to sockets.
+
+    Only a fresh upstream result is published: cached or fallback prices must
+    never become a snapshot, reach the sockets or trigger alerts.
+    """
+    request_news_ingest()  # no-op while the last ingestion is recent
+    market_data = fetch_market_data(force_refresh=True, fallback=False, _retry_attempt=retry_attempt)
+    sentiment = get_market_sentiment()
+    if not market_data:
+        logger.warning("No fresh market data, keeping current snapshot")
+        return get_snapshot_version()
+    refresh_longtail_quotes(tracked=market_data)
+    # Round-trip through the stored form so the comparison and deltas match what readers see
+    market_data = ColumnarSnapshot.from_dict(market_data).to_dict()
+    previous_version, previous = read_snapshot()
+    previous = previous or {}
+    if market_data == previous:
+        logger.info("Market data unchanged, keeping current snapshot")
+        publish_market_api_body(sentiment)
+        return previous_version
+    # Store the ticks first: readers that see the new version must find its rows
+    record_market_snapshot(market_data)
+    version = publish_market_snapshot(market_data)
+    publish_market_api_body(sentiment)
+    broadcast_market_snapshot(previous, previous_version, market_data, sentiment, version)
+    evaluate_alerts(market_data)
+    return version
+
+@shared_task(ignore_result=True)
+def refresh_coin_registry(retry_attempt=0):
+    """Reload the full CoinGecko coin list into the shared coin registry"""
+    coins = fetch_coin_list(fallback=False, _retry_attempt=retry_attempt)
+    if not coins:
+        logger.warning("Coin list unavailable, keeping current coin registry")
+        return None
+    return publish_coin_registry(coins)
+
+@shared_task(ignore_result=True)
+def ingest_news(retry_attempt=0):
+    """Fetch the latest articles and store and score the ones not seen before"""
+    return ingest_latest_news(retry_attempt=retry_attempt)
 
-    for crypto, info in data.items():
-        CryptoPrice.objects.create(
-            cryptocurrency=crypto,
-            price_usd=info['usd']
-        )
\ No newline at end of file
+@shared_task(ignore_result=True)
+def refresh_longtail_prices():
+    """Re-price the held coins outside the market snapshot (normally done by update_market_data)"""
+    return refresh_longtail_quotes()
@@ -1,3 +1,630 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .alert_engine import AlertBook, evaluate_alerts
+from .broadcast import MARKET_TICKER_GROUP, broadcast_market_snapshot, compute_delta, user_alerts_group
+from .coins import CoinRegistry
+from .columnar import ColumnarSnapshot
+from .indicators import EMA_BLOCK_SIZE, IndicatorSeries, ema
+from .localcache import local_cache
+from .longtail import LONGTAIL_PRICES_KEY, get_longtail_prices, refresh_longtail_prices
+from .models import Alert, NewsArticle, Portfolio
+from .news import NEWS_SENTIMENT_AGGREGATE_KEY, CoinMatcher, update_sentiment_aggregate
+from .search import CoinSearchIndex
+from .snapshots import (
+    MARKET_API_BODY_KEY, get_coin_sentiment, get_market_api_body, publish_market_api_body, publish_market_snapshot,
+)
+from .upstream import UpstreamRateLimited, coingecko_get_many
+from .utils import NEWS_PAGE_SIZE, adaptive_rate_limit_handler, fetch_market_data, fetch_news
+from .valuation import get_portfolio_valuation
+
+
+def naive_ema(values, alpha, prev=None):
+    out = []
+    for value in values:
+        prev = value if prev is None else alpha * value + (1 - alpha) * prev
+        out.append(prev)
+    return np.array(out)
+
+
+def make_points(closes, start=datetime(2026, 1, 1, tzinfo=dt_timezone.utc)):
+    return [{
+        'timestamp': start + timedelta(hours=i),
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'close': close,
+        'volume': 1000.0 + i,
+    } for i, close in enumerate(closes)]
+
+
+class EmaTests(SimpleTestCase):
+    def setUp(self):
+        self.values = 100 + np.cumsum(np.random.default_rng(7).normal(0, 1, EMA_BLOCK_SIZE * 5 + 17))
+
+    def test_matches_naive_loop_across_blocks(self):
+        for alpha in (2 / 15, 1 / 14, 2 / 27, 0.9):
+            np.testing.assert_allclose(ema(self.values, alpha), naive_ema(self.values, alpha), rtol=1e-10)
+
+    def test_continues_from_prev(self):
+        np.testing.assert_allclose(ema(self.values, 0.1, prev=95.0), naive_ema(self.values, 0.1, prev=95.0),
+                                   rtol=1e-10)
+
+    def test_split_equals_whole(self):
+        head = ema(self.values[:200], 0.2)
+        tail = ema(self.values[200:], 0.2, prev=head[-1])
+        np.testing.assert_allclose(np.concatenate((head, tail)), ema(self.values, 0.2), rtol=1e-10)
+
+    def test_edge_cases(self):
+        self.assertEqual(len(ema(np.empty(0), 0.5)), 0)
+        np.testing.assert_array_equal(ema(self.values, 1.0), self.values)
+
+
+class IndicatorSeriesTests(SimpleTestCase):
+    def setUp(self):
+        self.closes = list(100 + np.cumsum(np.random.default_rng(3).normal(0, 1, 400)))
+
+    def assertSeriesEqual(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for name in IndicatorSeries.INPUTS + IndicatorSeries.OUTPUTS:
+            np.testing.assert_allclose(actual.columns[name], expected.columns[name], rtol=1e-9, err_msg=name)
+
+    def test_incremental_extend_matches_full_build(self):
+        full = IndicatorSeries(14)
+        full.extend(make_points(self.closes))
+        incremental = IndicatorSeries(14)
+        points = make_points(self.closes)
+        for start in range(0, len(points), 37):
+            incremental.extend(points[start:start + 37])
+        self.assertSeriesEqual(incremental, full)
+
+    def test_ema_and_rsi_match_naive_loop(self):
+        series = IndicatorSeries(14)
+        series.extend(make_points(self.closes))
+        np.testing.assert_allclose(series.columns['ema'], naive_ema(self.closes, 2 / 15), rtol=1e-10)
+
+        deltas = np.diff(np.concatenate(([self.closes[0]], self.closes)))
+        gain = naive_ema(np.clip(deltas, 0, None), 1 / 14)
+        loss = naive_ema(np.clip(-deltas, 0, None), 1 / 14)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+        np.testing.assert_allclose(series.columns['rsi'], rsi, rtol=1e-9)
+
+    def test_rereading_open_bucket_replaces_it(self):
+        points = make_points(self.closes)
+        series = IndicatorSeries(14)
+        series.extend(points[:200])
+        # The last bucket was still open: it is read again with a new close, followed by later buckets
+        reread = dict(points[199], close=points[199]['close'] + 5.0)
+        series.extend([reread] + points[200:])
+
+        expected = IndicatorSeries(14)
+        expected.extend(points[:199] + [reread] + points[200:])
+        self.assertSeriesEqual(series, expected)
+        self.assertEqual(len(series), len(points))
+
+    def test_history_is_trimmed_from_the_front(self):
+        points = make_points(self.closes)
+        full = IndicatorSeries(14)
+        full.extend(points)
+        with mock.patch('tracker.indicators.HISTORY_LIMIT', 150):
+            series = IndicatorSeries(14)
+            for start in range(0, len(points), 37):
+                series.extend(points[start:start + 37])
+        self.assertEqual(len(series), 150)
+        for name in IndicatorSeries.INPUTS + IndicatorSeries.OUTPUTS:
+            np.testing.assert_allclose(series.columns[name], full.columns[name][-150:], rtol=1e-9, err_msg=name)
+
+
+def apply_delta(state, delta):
+    """What a ticker client does with a delta whose base matches its last seq"""
+    state = {coin_id: dict(data) for coin_id, data in state.items()}
+    for coin_id, changes in delta['changes'].items():
+        state.setdefault(coin_id, {}).update(changes)
+    for coin_id in delta['removed']:
+        state.pop(coin_id, None)
+    return state
+
+
+class AlertBookTests(SimpleTestCase):
+    def setUp(self):
+        self.book = AlertBook()
+        for alert_id, condition, target in ((1, 'above', 90.0), (2, 'above', 100.0), (3, 'above', 110.0),
+                                            (4, 'below', 90.0), (5, 'below', 100.0), (6, 'below', 110.0)):
+            self.book.add(alert_id, condition, target)
+
+    def test_price_equal_to_target_triggers_both_conditions(self):
+        self.assertCountEqual(self.book.triggered(100.0), [1, 2, 5, 6])
+
+    def test_between_targets(self):
+        self.assertCountEqual(self.book.triggered(95.0), [1, 5, 6])
+        self.assertCountEqual(self.book.triggered(109.99), [1, 2, 6])
+
+    def test_outside_every_target(self):
+        self.assertCountEqual(self.book.triggered(200.0), [1, 2, 3])
+        self.assertCountEqual(self.book.triggered(1.0), [4, 5, 6])
+
+    def test_discard(self):
+        self.book.discard({2, 5})
+        self.assertCountEqual(self.book.triggered(100.0), [1, 6])
+        self.assertEqual(len(self.book), 4)
+
+
+class EvaluateAlertsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('trader', password='x')
+        self.alert = Alert.objects.create(user=user, cryptocurrency='bitcoin', condition='above',
+                                          target_price=50000, is_active=True)
+
+    def test_triggers_and_deactivates(self):
+        self.assertEqual(evaluate_alerts({'bitcoin': {'usd': 50000.0, 'last_updated': '2026-01-01T00:00:00Z'}}), 1)
+        self.alert.refresh_from_db()
+        self.assertFalse(self.alert.is_active)
+        self.assertEqual(evaluate_alerts({'bitcoin': {'usd': 60000.0, 'last_updated': '2026-01-01T00:05:00Z'}}), 0)
+
+    def test_notifies_every_user_in_one_send(self):
+        other = User.objects.create_user('holder', password='x')
+        Alert.objects.create(user=other, cryptocurrency='bitcoin', condition='above', target_price=49000, is_active=True)
+        with mock.patch('tracker.alert_engine.send_to_groups') as send_to_groups:
+            self.assertEqual(evaluate_alerts({'bitcoin': {'usd': 50000.0, 'last_updated': '2026-01-01T00:00:00Z'}}), 2)
+        send_to_groups.assert_called_once()
+        messages = list(send_to_groups.call_args.args[0])
+        self.assertEqual(sorted(group for group, _ in messages),
+                         sorted(user_alerts_group(user_id) for user_id in (self.alert.user_id, other.id)))
+        self.assertTrue(all(message['type'] == 'alert.triggered' for _, message in messages))
+
+    def test_ignores_fallback_prices(self):
+        self.assertEqual(evaluate_alerts({'bitcoin': {'usd': 60000, 'last_updated': 'FALLBACK'}}), 0)
+        self.alert.refresh_from_db()
+        self.assertTrue(self.alert.is_active)
+
+
+class TickerDeltaTests(SimpleTestCase):
+    previous = {
+        'bitcoin': {'usd': 60000.0, 'usd_24h_change': 1.5, 'name': 'Bitcoin'},
+        'ethereum': {'usd': 2500.0, 'usd_24h_change': -0.5, 'name': 'Ethereum'},
+        'dogecoin': {'usd': 0.1, 'usd_24h_change': 0.0, 'name': 'Dogecoin'},
+    }
+    current = {
+        'bitcoin': {'usd': 60100.0, 'usd_24h_change': 1.5, 'name': 'Bitcoin'},
+        'ethereum': {'usd': 2500.0, 'usd_24h_change': -0.5, 'name': 'Ethereum'},
+        'solana': {'usd': 150.0, 'usd_24h_change': 3.0, 'name': 'Solana'},
+    }
+
+    def test_compute_delta(self):
+        changes, removed = compute_delta(self.previous, self.current)
+        self.assertEqual(changes, {'bitcoin': {'usd': 60100.0}, 'solana': self.current['solana']})
+        self.assertEqual(removed, ['dogecoin'])
+        self.assertEqual(compute_delta(self.current, self.current), ({}, []))
+
+    def test_applying_delta_to_base_gives_current(self):
+        changes, removed = compute_delta(self.previous, self.current)
+        self.assertEqual(apply_delta(self.previous, {'changes': changes, 'removed': removed}), self.current)
+
+    @mock.patch('tracker.broadcast.send_to_groups', return_value=0)
+    @mock.patch('tracker.broadcast.send_to_group', return_value=True)
+    def test_broadcast_carries_base_and_seq(self, send_to_group, send_to_groups):
+        sentiment = {'score': 0.5, 'label': 'Neutral'}
+        broadcast_market_snapshot(self.previous, 4, self.current, sentiment, 5)
+
+        group, message = send_to_group.call_args.args
+        self.assertEqual(group, MARKET_TICKER_GROUP)
+        delta = json.loads(message['text'])
+        self.assertEqual((delta['type'], delta['base'], delta['seq']), ('delta', 4, 5))
+        self.assertEqual(delta['sentiment'], sentiment)
+        # A client at the base version ends up at the new one; any other client must resync
+        self.assertEqual(apply_delta(self.previous, delta), self.current)
+
+        coin_groups = [group for group, _ in send_to_groups.call_args.args[0]]
+        self.assertCountEqual(coin_groups, ['ticker.bitcoin', 'ticker.solana'])
+
+
+class ColumnarSnapshotTests(SimpleTestCase):
+    market_data = {
+        'bitcoin': {'usd': 60000.5, 'usd_24h_change': 1.25, 'volume_24h': 3.5e10, 'market_cap': 1.2e12,
+                    'market_cap_rank': 1, 'symbol': 'BTC', 'name': 'Bitcoin',
+                    'last_updated': '2026-01-01T00:00:00Z', 'sentiment': 'Positive'},
+        'tiny-coin': {'usd': 1.234e-12, 'usd_24h_change': -3.0, 'volume_24h': 12.0, 'market_cap': 0.0,
+                      'market_cap_rank': None, 'symbol': 'TINY', 'name': 'Tiny Coin \u00e9',
+                      'last_updated': '', 'sentiment': 'Neutral'},
+    }
+
+    def test_bytes_round_trip(self):
+        payload = ColumnarSnapshot.from_dict(self.market_data).to_bytes()
+        restored = ColumnarSnapshot.from_bytes(payload)
+        self.assertEqual(restored.to_dict(), self.market_data)
+        self.assertIsNone(restored.row('tiny-coin')['market_cap_rank'])
+        self.assertEqual(restored.ranks(), {'bitcoin': 1})
+
+    def test_round_trip_keeps_order_and_types(self):
+        restored = ColumnarSnapshot.from_bytes(ColumnarSnapshot.from_dict(self.market_data).to_bytes())
+        self.assertEqual(restored.ids, list(self.market_data))
+        row = restored.row('bitcoin')
+        self.assertIsInstance(row['usd'], float)
+        self.assertIsInstance(row['market_cap_rank'], int)
+        self.assertIsNone(restored.row('ethereum'))
+
+    def test_empty_snapshot(self):
+        restored = ColumnarSnapshot.from_bytes(ColumnarSnapshot.from_dict({}).to_bytes())
+        self.assertEqual(len(restored), 0)
+        self.assertEqual(restored.to_dict(), {})
+
+    def test_rejects_other_payloads(self):
+        with self.assertRaises(ValueError):
+            ColumnarSnapshot.from_bytes(b'NOTSNP' + bytes(10))
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+        self.release = threading.Event()
+
+        @adaptive_rate_limit_handler(retry_task='tracker.tasks.update_market_data')
+        def fetch_quote(coin_id):
+            self.calls.append(coin_id)
+            self.release.wait(5)
+            return {'coin': coin_id}
+        self.fetch_quote = fetch_quote
+
+    def run_concurrently(self, args):
+        results = [None] * len(args)
+
+        def call(i):
+            results[i] = self.fetch_quote(args[i])
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(args))]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)  # let every caller reach the in-flight call before it completes
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_same_arguments_share_one_upstream_call(self):
+        results = self.run_concurrently(['bitcoin'] * 6)
+        self.assertEqual(self.calls, ['bitcoin'])
+        self.assertEqual(results, [{'coin': 'bitcoin'}] * 6)
+
+    def test_different_arguments_get_their_own_call(self):
+        args = ['bitcoin', 'ethereum', 'bitcoin', 'solana', 'ethereum']
+        results = self.run_concurrently(args)
+        self.assertCountEqual(self.calls, ['bitcoin', 'ethereum', 'solana'])
+        self.assertEqual(results, [{'coin': coin_id} for coin_id in args])
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+    @mock.patch('tracker.tasks.update_market_data')
+    def test_rate_limit_re_enqueues_owning_task(self, task):
+        @adaptive_rate_limit_handler(retry_task='tracker.tasks.update_market_data')
+        def limited():
+            raise UpstreamRateLimited('coingecko', 30.0)
+
+        self.assertIsNone(limited(fallback=False))
+        task.apply_async.assert_called_once_with(kwargs={'retry_attempt': 1}, countdown=31.0)
+        # Calls inside the rate-limit window queue no further retries
+        limited(fallback=False)
+        self.assertEqual(task.apply_async.call_count, 1)
+
+    def test_rate_limited_caller_gets_stale_result(self):
+        self.release.set()
+        self.assertEqual(self.fetch_quote('bitcoin'), {'coin': 'bitcoin'})
+        cache.set('rate_limit:fetch_quote', time.time() + 60)
+
+        self.assertEqual(self.fetch_quote('bitcoin'), {'coin': 'bitcoin'})
+        self.assertIsNone(self.fetch_quote('bitcoin', fallback=False))
+        self.assertEqual(self.calls, ['bitcoin'])
+
+
+def market_page(page, per_page=2):
+    first = (page - 1) * per_page
+    return [{'id': f'coin-{first + i}', 'current_price': 1.0 + i, 'market_cap_rank': first + i + 1} for i in range(per_page)]
+
+
+@mock.patch('tracker.upstream.HTTPX_AVAILABLE', False)
+@mock.patch('tracker.upstream.bucket_capacity', return_value=2)
+@mock.patch('tracker.upstream.coingecko_get', side_effect=lambda path, params, reserved=False: market_page(params['page']))
+class CoingeckoPagingTests(SimpleTestCase):
+    pages = [{'page': page} for page in range(1, 6)]
+
+    @mock.patch('tracker.upstream.acquire_tokens', return_value=0)
+    def test_all_rounds_fetched_in_order(self, acquire_tokens, coingecko_get, capacity):
+        self.assertEqual(coingecko_get_many('coins/markets', self.pages), [market_page(page) for page in range(1, 6)])
+        self.assertEqual([call.args[1] for call in acquire_tokens.call_args_list], [2, 2, 1])
+
+    @mock.patch('tracker.upstream.acquire_tokens', side_effect=[0, 0, 12.0])
+    def test_later_round_without_tokens_returns_pages_so_far(self, acquire_tokens, coingecko_get, capacity):
+        with mock.patch('tracker.upstream.time.sleep') as sleep:
+            results = coingecko_get_many('coins/markets', self.pages)
+        self.assertEqual(results, [market_page(page) for page in range(1, 5)])
+        sleep.assert_not_called()
+
+    @mock.patch('tracker.upstream.acquire_tokens', return_value=12.0)
+    def test_first_round_without_tokens_raises(self, acquire_tokens, coingecko_get, capacity):
+        with self.assertRaises(UpstreamRateLimited):
+            coingecko_get_many('coins/markets', self.pages)
+        coingecko_get.assert_not_called()
+
+    @override_settings(MARKET_DATA_COINS=6)
+    @mock.patch('tracker.upstream.acquire_tokens', side_effect=[0, 12.0])
+    def test_market_data_keeps_cached_coins_for_missing_pages(self, acquire_tokens, coingecko_get, capacity):
+        cached = {f'coin-{i}': {'usd': 100.0 + i} for i in range(8)}
+        with mock.patch('tracker.utils.read_snapshot', return_value=(1, cached)), \
+                mock.patch('tracker.utils.MARKET_PAGE_SIZE', 2), \
+                mock.patch('tracker.utils.open', mock.mock_open()):
+            market_data = fetch_market_data.__wrapped__(min_coins=6, force_refresh=True)
+        self.assertEqual(list(market_data), [f'coin-{i}' for i in range(6)])
+        self.assertEqual([market_data[f'coin-{i}']['usd'] for i in range(4)], [1.0, 2.0, 1.0, 2.0])
+        self.assertEqual([market_data[f'coin-{i}'] for i in (4, 5)], [cached['coin-4'], cached['coin-5']])
+
+
+class PortfolioValuationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        publish_market_snapshot({'bitcoin': {'usd': 50000.0}, 'ethereum': {'usd': 2000.0}})
+        self.user = User.objects.create_user('holder', password='x')
+        self.holding = Portfolio.objects.create(user=self.user, cryptocurrency='bitcoin', amount=2, purchase_price=40000)
+
+    def test_valuation_is_cached_per_snapshot_version(self):
+        self.assertEqual(get_portfolio_valuation(self.user).summary(),
+                         {'current_value': 100000.0, 'invested': 80000.0, 'profit_loss': 20000.0})
+        with mock.patch('tracker.valuation.value_portfolio') as value_portfolio:
+            get_portfolio_valuation(self.user)
+        value_portfolio.assert_not_called()
+
+        publish_market_snapshot({'bitcoin': {'usd': 45000.0}, 'ethereum': {'usd': 2000.0}})
+        self.assertEqual(get_portfolio_valuation(self.user).current_value, 90000.0)
+
+    def test_holding_changes_invalidate_the_cached_valuation(self):
+        get_portfolio_valuation(self.user)
+        Portfolio.objects.create(user=self.user, cryptocurrency='ethereum', amount=5, purchase_price=1000)
+        self.assertEqual(get_portfolio_valuation(self.user).current_value, 110000.0)
+
+        self.holding.amount = 1
+        self.holding.save()
+        self.assertEqual(get_portfolio_valuation(self.user).current_value, 60000.0)
+
+        self.holding.delete()
+        valuation = get_portfolio_valuation(self.user)
+        self.assertEqual(valuation.coins, ['ethereum'])
+        self.assertEqual(valuation.summary(), {'current_value': 10000.0, 'invested': 5000.0, 'profit_loss': 5000.0})
+
+    def test_other_users_are_not_invalidated(self):
+        other = User.objects.create_user('other', password='x')
+        get_portfolio_valuation(self.user)
+        Portfolio.objects.create(user=other, cryptocurrency='ethereum', amount=1, purchase_price=1000)
+        with mock.patch('tracker.valuation.value_portfolio') as value_portfolio:
+            get_portfolio_valuation(self.user)
+        value_portfolio.assert_not_called()
+
+
+class CoinRegistryTests(SimpleTestCase):
+    registry = CoinRegistry([
+        ('bitcoin', 'btc', 'Bitcoin'),
+        ('osmosis', 'osmo', 'Osmosis'),
+        ('solana', 'sol', 'Solana'),
+        ('wrapped-solana', 'sol', 'Wrapped SOL'),
+        ('sol-token', 'solt', 'SOL'),
+    ])
+
+    def test_symbol_and_name_hits_are_merged(self):
+        self.assertEqual(self.registry.candidates('SOL'), ('solana', 'wrapped-solana', 'sol-token'))
+        self.assertEqual(self.registry.candidates('bitcoin'), ('bitcoin',))
+        self.assertEqual(self.registry.candidates('Osmosis'), ('osmosis',))
+        self.assertEqual(self.registry.candidates('nope'), ())
+
+    def test_ambiguous_text_resolves_to_best_ranked_coin(self):
+        ranks = {'solana': 5, 'wrapped-solana': 300, 'sol-token': 2000}
+        self.assertEqual(self.registry.resolve('sol', ranks), 'solana')
+        self.assertEqual(self.registry.resolve('sol', {'sol-token': 2000}), 'sol-token')
+        self.assertIsNone(self.registry.resolve('sol'))
+        self.assertEqual(self.registry.resolve('BTC'), 'bitcoin')
+
+
+class CoinSearchIndexTests(SimpleTestCase):
+    coins = [
+        ('bitcoin', 'btc', 'Bitcoin'),
+        ('bitcoin-cash', 'bch', 'Bitcoin Cash'),
+        ('wrapped-bitcoin', 'wbtc', 'Wrapped Bitcoin'),
+        ('ethereum', 'eth', 'Ethereum'),
+        ('ethena', 'ena', 'Ethena'),
+        ('ether-fi', 'ethfi', 'Ether.fi'),
+        ('tether', 'usdt', 'Tether'),
+        ('toncoin', 'ton', 'Toncoin'),
+        ('tron', 'trx', 'TRON'),
+        ('bit-token', 'bit', 'Bit Token'),
+    ]
+    ranks = {'bitcoin': 1, 'ethereum': 2, 'tether': 3, 'tron': 10, 'toncoin': 12, 'wrapped-bitcoin': 15,
+             'bitcoin-cash': 20, 'ethena': 40}
+
+    def setUp(self):
+        self.index = CoinSearchIndex(self.coins)
+        self.index.set_ranks(self.ranks, 1)
+
+    def test_exact_terms_come_before_prefix_matches(self):
+        self.assertEqual(self.index.search('eth'), ['ethereum', 'ethena', 'ether-fi'])
+        self.assertEqual(self.index.search('bit'), ['bit-token', 'bitcoin', 'wrapped-bitcoin', 'bitcoin-cash'])
+
+    def test_prefix_matches_follow_market_cap_rank(self):
+        self.assertEqual(self.index.search('t'), ['tether', 'tron', 'toncoin', 'bit-token'])
+        self.assertEqual(self.index.search('t', limit=2), ['tether', 'tron'])
+        self.index.set_ranks({'toncoin': 1}, 2)
+        self.assertEqual(self.index.search('t'), ['toncoin', 'tron', 'tether', 'bit-token'])
+
+    def test_rank_walk_matches_direct_scan(self):
+        queries = ('b', 'bit', 'bitcoin', 'eth', 't', 'to', 'token', 'w', 'zzz')
+        expected = {(query, limit): self.index.search(query, limit) for query in queries for limit in (1, 3, 20)}
+        with mock.patch('tracker.search.SCAN_LIMIT', 0):
+            for (query, limit), results in expected.items():
+                self.assertEqual(self.index.search(query, limit), results, (query, limit))
+
+    def test_misspellings_fall_back_to_trigrams(self):
+        self.assertEqual(self.index.search('etherium')[0], 'ethereum')
+        self.assertEqual(self.index.search('bitcoin kash')[0], 'bitcoin-cash')
+        self.assertEqual(self.index.search('qqqq'), [])
+
+
+class MarketApiBodyTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        publish_market_snapshot({'bitcoin': {'usd': 50000.0}})
+
+    def test_evicted_body_is_rebuilt(self):
+        etag = publish_market_api_body({'score': 0.5, 'label': 'Neutral'})
+        cache.delete(MARKET_API_BODY_KEY.format(etag=etag))
+        local_cache.clear()
+        rebuilt_etag, _, body = get_market_api_body()
+        self.assertEqual(rebuilt_etag, etag)
+        self.assertEqual(json.loads(body)['market_data'], {'bitcoin': {'usd': 50000.0}})
+        self.assertEqual(cache.get(MARKET_API_BODY_KEY.format(etag=etag)), body)
+
+
+@mock.patch('tracker.utils.NEWSAPI_KEY', 'key')
+class NewsPagingTests(SimpleTestCase):
+    page = {'articles': [{'url': f'https://example.com/{i}'} for i in range(NEWS_PAGE_SIZE)]}
+
+    @mock.patch('tracker.utils.newsapi_get')
+    def test_failed_later_page_keeps_earlier_pages(self, newsapi_get):
+        newsapi_get.side_effect = [self.page, requests.HTTPError('426 Upgrade Required')]
+        self.assertEqual(fetch_news.__wrapped__(pages=3), self.page['articles'])
+        self.assertEqual(newsapi_get.call_count, 2)
+
+    @mock.patch('tracker.utils.newsapi_get', side_effect=requests.HTTPError('500 Server Error'))
+    def test_failed_first_page_propagates(self, newsapi_get):
+        with self.assertRaises(requests.HTTPError):
+            fetch_news.__wrapped__(pages=3)
+
+
+@override_settings(NEWS_SENTIMENT_HALF_LIFE=3600)
+class SentimentAggregateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # A missing aggregate is rebuilt from articles published around the real clock; whole seconds so
+        # the stored published_at timestamps are exact
+        self.now = float(int(time.time()))
+
+    def article(self, hours_ago, score, coins):
+        return NewsArticle.objects.create(
+            url=f'https://example.com/{len(coins)}-{hours_ago}-{score}', title='t', sentiment_score=score, coins=coins,
+            published_at=datetime.fromtimestamp(self.now - hours_ago * 3600, tz=dt_timezone.utc))
+
+    def update_at(self, timestamp, articles):
+        with mock.patch('tracker.news.time') as clock, mock.patch('tracker.news.publish_market_api_body'):
+            clock.time.return_value = timestamp
+            return update_sentiment_aggregate(articles)
+
+    def test_scores_are_decay_weighted_means(self):
+        articles = [self.article(0, 0.9, ['bitcoin']), self.article(1, 0.2, ['bitcoin', 'ethereum'])]
+        sentiment = self.update_at(self.now, articles)
+        self.assertEqual(sentiment, {'score': round((0.9 + 0.2 * 0.5) / 1.5, 3), 'label': 'Very Positive'})
+        self.assertEqual(get_coin_sentiment(), {'bitcoin': 'Very Positive', 'ethereum': 'Very Negative'})
+
+    def test_incremental_updates_match_a_rebuild(self):
+        self.article(3, 0.8, ['bitcoin'])
+        self.update_at(self.now - 2 * 3600, [])  # rebuilt from the stored article
+        second = self.article(1, 0.3, ['bitcoin', 'solana'])
+        self.update_at(self.now - 3600, [second])
+        incremental = self.update_at(self.now, [self.article(0, 0.6, ['solana'])])
+        folded = cache.get(NEWS_SENTIMENT_AGGREGATE_KEY)
+
+        cache.clear()
+        self.assertEqual(self.update_at(self.now, []), incremental)
+        rebuilt = cache.get(NEWS_SENTIMENT_AGGREGATE_KEY)
+        np.testing.assert_allclose(folded['market'], rebuilt['market'], rtol=1e-12)
+        self.assertEqual(folded['coins'].keys(), rebuilt['coins'].keys())
+        for coin_id, sums in folded['coins'].items():
+            np.testing.assert_allclose(sums, rebuilt['coins'][coin_id], rtol=1e-12)
+
+    def test_old_mentions_revert_to_neutral(self):
+        self.update_at(self.now, [self.article(0, 0.9, ['bitcoin'])])
+        self.assertEqual(get_coin_sentiment(), {'bitcoin': 'Very Positive'})
+        sentiment = self.update_at(self.now + 5 * 3600, [])
+        self.assertEqual(get_coin_sentiment(), {})
+        self.assertEqual(sentiment, {'score': 0.5, 'label': 'Neutral'})
+
+
+class CoinMatcherTests(SimpleTestCase):
+    matcher = CoinMatcher(
+        [('bitcoin', 'btc', 'Bitcoin'), ('bitcoin-cash', 'bch', 'Bitcoin Cash'), ('flow', 'flow', 'Flow'),
+         ('stellar', 'xlm', 'Stellar')],
+        [('the-market', 'market', 'The Market'), ('price-action', 'pa', 'Price Action'),
+         ('donald-trump', 'trump', 'Donald Trump'), ('federal-reserve', 'fed', 'Federal Reserve'),
+         ('gold', 'gold', 'Gold')],
+    )
+
+    def test_tracked_coins_match_by_name_and_symbol(self):
+        self.assertEqual(self.matcher.mentions("Bitcoin Cash jumps while BTC and $xlm slip"),
+                         {'bitcoin-cash', 'bitcoin', 'stellar'})
+        self.assertEqual(self.matcher.mentions("bitcoin cash, Flow"), {'bitcoin-cash', 'flow'})
+
+    def test_lowercase_one_word_names_are_ordinary_words(self):
+        self.assertEqual(self.matcher.mentions("a stellar quarter for the flow of funds"), set())
+
+    def test_long_tail_names_never_match(self):
+        for text in ("What the market expects next", "Price action stalls below resistance",
+                     "Donald Trump comments on crypto", "The Federal Reserve holds rates", "THE MARKET, GOLD, FED"):
+            self.assertEqual(self.matcher.mentions(text), set(), text)
+
+    def test_long_tail_coins_match_by_ticker(self):
+        self.assertEqual(self.matcher.mentions("$TRUMP and $fed rally"), {'donald-trump', 'federal-reserve'})
+
+
+@override_settings(MARKET_DATA_REFRESH_INTERVAL=60)
+class LongtailPriceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['bulk'].clear()
+        user = User.objects.create_user('holder', password='x')
+        for coin in ('bitcoin', 'tiny-coin', 'other-coin'):
+            Portfolio.objects.create(user=user, cryptocurrency=coin, amount=1, purchase_price=1)
+
+    def refresh_at(self, timestamp, prices=None, error=None):
+        with mock.patch('tracker.longtail.time') as clock, \
+                mock.patch('tracker.longtail.fetch_simple_prices', return_value=prices, side_effect=error) as fetch:
+            clock.time.return_value = timestamp
+            refresh_longtail_prices(tracked=['bitcoin'])
+        return fetch
+
+    def prices_at(self, timestamp, coins):
+        with mock.patch('tracker.longtail.time') as clock, \
+                mock.patch('tracker.longtail.request_longtail_refresh') as request_refresh:
+            clock.time.return_value = timestamp
+            return get_longtail_prices(coins), request_refresh.called
+
+    def test_unpriced_coins_are_pending_until_refreshed(self):
+        quotes, refresh_requested = self.prices_at(1000.0, ['tiny-coin'])
+        self.assertEqual((quotes, refresh_requested), ({}, True))
+
+        fetch = self.refresh_at(1000.0, {'tiny-coin': {'usd': 0.5, 'usd_24h_change': -2.0}})
+        self.assertCountEqual(fetch.call_args.args[0], ['tiny-coin', 'other-coin'])  # tracked coins are skipped
+        quotes, refresh_requested = self.prices_at(1010.0, ['tiny-coin', 'other-coin'])
+        self.assertEqual(quotes, {'tiny-coin': {'usd': 0.5, 'usd_24h_change': -2.0, 'updated_at': 1000.0,
+                                                'stale': False}})
+        self.assertTrue(refresh_requested)  # other-coin is still unpriced
+
+    def test_quotes_go_stale_when_refreshes_fail(self):
+        self.refresh_at(1000.0, {'tiny-coin': {'usd': 0.5}, 'other-coin': {'usd': 2.0}})
+        self.refresh_at(1100.0, error=UpstreamRateLimited('coingecko', 30.0))
+        quotes, refresh_requested = self.prices_at(1180.0, ['tiny-coin'])
+        self.assertEqual(quotes['tiny-coin']['usd'], 0.5)
+        self.assertFalse(quotes['tiny-coin']['stale'] or refresh_requested)
+        quotes, _ = self.prices_at(1181.0, ['tiny-coin'])
+        self.assertTrue(quotes['tiny-coin']['stale'])
+
+    def test_oldest_quotes_are_refreshed_first(self):
+        self.refresh_at(1000.0, {'tiny-coin': {'usd': 0.5}})
+        self.refresh_at(1060.0, {'other-coin': {'usd': 2.0}})
+        fetch = self.refresh_at(1120.0, {})
+        self.assertEqual(fetch.call_args.args[0], ['tiny-coin', 'other-coin'])
+        Portfolio.objects.filter(cryptocurrency='other-coin').delete()
+        self.refresh_at(1180.0, {})
+        self.assertEqual(list(caches['bulk'].get(LONGTAIL_PRICES_KEY)), ['tiny-coin'])
@@ -0,0 +1,124 @@
+import logging
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CryptoPrice, PriceRollup
+
+logger = logging.getLogger(__name__)
+
+RESOLUTION_SECONDS = {'1m': 60, '5m': 300, '1h': 3600, '1d': 86400}
+RAW_RESOLUTION = 'raw'
+
+def _to_decimal(value) -> Optional[Decimal]:
+    if value is None:
+        return None
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+
+def _bucket_start(timestamp: datetime, seconds: int) -> datetime:
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+# ------------------ Ingestion ------------------
+
+def record_market_snapshot(market_data: Dict, timestamp: Optional[datetime] = None) -> int:
+    """Store one price tick per coin and fold it into the OHLCV rollups.
+
+    Everything is written with bulk queries: one INSERT for the raw ticks
+    plus a SELECT and bulk write per rollup resolution.
+    """
+    timestamp = timestamp or timezone.now()
+    ticks = {}
+    for coin_id, data in market_data.items():
+        price = _to_decimal(data.get('usd'))
+        if price is None or data.get('last_updated') == 'FALLBACK':
+            continue
+        ticks[coin_id] = (price, _to_decimal(data.get('volume_24h')), data)
+    if not ticks:
+        return 0
+
+    with transaction.atomic():
+        CryptoPrice.objects.bulk_create([
+            CryptoPrice(
+                cryptocurrency=coin_id,
+                price_usd=price,
+                usd_24h_change=_to_decimal(data.get('usd_24h_change')),
+                usd_market_cap=_to_decimal(data.get('market_cap')),
+                usd_24h_vol=volume,
+                timestamp=timestamp,
+            )
+            for coin_id, (price, volume, data) in ticks.items()
+        ], batch_size=500)
+        for resolution in RESOLUTION_SECONDS:
+            _update_rollups(ticks, resolution, timestamp)
+
+    logger.info(f"Recorded {len(ticks)} price ticks at {timestamp:%Y-%m-%d %H:%M:%S}")
+    return len(ticks)
+
+def _update_rollups(ticks: Dict, resolution: str, timestamp: datetime) -> None:
+    bucket_start = _bucket_start(timestamp, RESOLUTION_SECONDS[resolution])
+    existing = {
+        rollup.cryptocurrency: rollup
+        for rollup in PriceRollup.objects.filter(resolution=resolution, bucket_start=bucket_start)
+    }
+    to_create, to_update = [], []
+    for coin_id, (price, volume, _) in ticks.items():
+        rollup = existing.get(coin_id)
+        if rollup is None:
+            to_create.append(PriceRollup(
+                cryptocurrency=coin_id, resolution=resolution, bucket_start=bucket_start,
+                open=price, high=price, low=price, close=price, volume=volume,
+            ))
+            continue
+        rollup.high = max(rollup.high, price)
+        rollup.low = min(rollup.low, price)
+        rollup.close = price
+        rollup.volume = volume  # CoinGecko reports rolling 24h volume, keep the latest reading
+        rollup.sample_count += 1
+        to_update.append(rollup)
+
+    # A concurrent ingester may have opened the same bucket; its row wins
+    PriceRollup.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+    PriceRollup.objects.bulk_update(to_update, ['high', 'low', 'close', 'volume', 'sample_count'], batch_size=500)
+
+# ------------------ Queries ------------------
+
+def get_price_series(coin_id: str, resolution: str = '1h', since: Optional[datetime] = None,
+                     limit: int = 500) -> List[Dict]:
+    """Return up to `limit` chronological OHLCV points for one coin.
+
+    `resolution` is one of RESOLUTION_SECONDS or 'raw' for the stored ticks.
+    """
+    if resolution == RAW_RESOLUTION:
+        qs = CryptoPrice.objects.filter(cryptocurrency=coin_id, price_usd__isnull=False)
+        if since:
+            qs = qs.filter(timestamp__gte=since)
+        rows = [{
+            'timestamp': timestamp, 'open': price, 'high': price, 'low': price, 'close': price, 'volume': volume,
+        } for timestamp, price, volume in qs.order_by('-timestamp').values_list('timestamp', 'price_usd', 'usd_24h_vol')[:limit]]
+    else:
+        if resolution not in RESOLUTION_SECONDS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        qs = PriceRollup.objects.filter(cryptocurrency=coin_id, resolution=resolution)
+        if since:
+            qs = qs.filter(bucket_start__gte=since)
+        rows = [{
+            'timestamp': row['bucket_start'], 'open': row['open'], 'high': row['high'],
+            'low': row['low'], 'close': row['close'], 'volume': row['volume'],
+        } for row in qs.order_by('-bucket_start').values('bucket_start', 'open', 'high', 'low', 'close', 'volume')[:limit]]
+    rows.reverse()
+    return rows
+
+def get_chart_data(coin_id: str, resolution: str = '1h', limit: int = 50) -> Dict[str, List]:
+    """Labels/values pair of closing prices, in the shape the Chart.js templates expect"""
+    series = get_price_series(coin_id, resolution, limit=limit)
+    return {
+        "labels": [point['timestamp'].strftime("%Y-%m-%d %H:%M") for point in series],
+        "values": [float(point['close']) for point in series],
+    }
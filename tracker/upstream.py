@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Check for httpx (concurrent page fetching)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    logger.warning("httpx not installed. Multi-page CoinGecko fetches will run sequentially.")
+
+COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
+NEWSAPI_BASE_URL = "https://newsapi.org/v2"
+SIMPLE_PRICE_BATCH_SIZE = 250  # ids per simple/price call, well under CoinGecko's URL limit
+
+class UpstreamRateLimited(requests.exceptions.RequestException):
+    """Raised instead of calling upstream when the shared token bucket is empty"""
+    def __init__(self, bucket: str, retry_after: float):
+        super().__init__(f"{bucket} rate limit reached, retry in {retry_after:.1f}s")
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+# ------------------ Session ------------------
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Process-wide session so upstream calls reuse keep-alive TCP/TLS connections"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update({'Accept': 'application/json'})
+                _session = session
+    return _session
+
+def _timeout() -> int:
+    return settings.API_RATE_LIMITS.get('DEFAULT_TIMEOUT', 30)
+
+# ------------------ Token bucket ------------------
+
+# KEYS[1] = bucket key; ARGV = rate (tokens/s), capacity, now, requested
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+_local_buckets: Dict[str, Tuple[float, float]] = {}
+_local_buckets_lock = threading.Lock()
+_bucket_script = None
+
+def _bucket_limits(bucket: str) -> Tuple[float, float]:
+    """(refill rate per second, capacity) for a bucket from settings.API_RATE_LIMITS"""
+    limits = settings.API_RATE_LIMITS
+    if bucket == 'newsapi':
+        per_day = limits.get('NEWSAPI_REQUESTS_PER_DAY', 1000)
+        return per_day / 86400.0, max(1.0, per_day / 24.0)
+    per_minute = limits.get('COINGECKO_REQUESTS_PER_MINUTE', 10)
+    return per_minute / 60.0, float(per_minute)
+
+def bucket_capacity(bucket: str) -> int:
+    """Most tokens a single acquire_tokens() call can ever be granted"""
+    return max(1, int(_bucket_limits(bucket)[1]))
+
+def acquire_tokens(bucket: str, tokens: int = 1) -> float:
+    """Take tokens from a bucket shared by every process; returns 0 or the seconds to wait"""
+    rate, capacity = _bucket_limits(bucket)
+    now = time.time()
+    from .utils import _get_redis_connection
+    conn = _get_redis_connection()
+    if conn is not None:
+        global _bucket_script
+        try:
+            if _bucket_script is None:
+                _bucket_script = conn.register_script(_TOKEN_BUCKET_SCRIPT)
+            return float(_bucket_script(keys=[f"token_bucket:{bucket}"], args=[rate, capacity, now, tokens]))
+        except Exception as e:
+            logger.warning(f"Shared token bucket unavailable, using process-local bucket: {e}")
+
+    with _local_buckets_lock:
+        available, last = _local_buckets.get(bucket, (capacity, now))
+        available = min(capacity, available + max(0.0, now - last) * rate)
+        if available >= tokens:
+            _local_buckets[bucket] = (available - tokens, now)
+            return 0.0
+        _local_buckets[bucket] = (available, now)
+        return (tokens - available) / rate
+
+def _request(bucket: str, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+             reserved: bool = False):
+    if not reserved and (wait := acquire_tokens(bucket)):
+        raise UpstreamRateLimited(bucket, wait)
+    response = get_session().get(url, params=params, headers=headers, timeout=_timeout())
+    logger.info(f"{bucket} GET {url} -> {response.status_code}")
+    response.raise_for_status()
+    return response.json()
+
+# ------------------ CoinGecko ------------------
+
+def coingecko_get(path: str, params: Optional[Dict] = None, reserved: bool = False):
+    """GET a CoinGecko endpoint through the pooled session and shared rate limit.
+
+    Pass reserved=True when the caller already took tokens with acquire_tokens().
+    """
+    api_key = getattr(settings, 'COINGECKO_API_KEY', '')
+    headers = {'x-cg-demo-api-key': api_key} if api_key else {}
+    return _request('coingecko', f"{COINGECKO_BASE_URL}/{path.lstrip('/')}", params, headers, reserved)
+
+def coingecko_get_many(path: str, params_list: List[Dict]) -> List:
+    """GET the same endpoint with several parameter sets concurrently.
+
+    Requests go out in rounds of at most the bucket capacity, with the tokens
+    for a round reserved up front so it is sent at once (about one round
+    trip with httpx). UpstreamRateLimited is raised before anything is sent
+    if the first round has no tokens; if a later round has none, the results
+    fetched so far are returned (shorter than params_list) rather than
+    holding the worker until the bucket refills.
+    """
+    results = []
+    capacity = bucket_capacity('coingecko')
+    for start in range(0, len(params_list), capacity):
+        batch = params_list[start:start + capacity]
+        wait = acquire_tokens('coingecko', len(batch))
+        if wait and start:
+            logger.info(f"No coingecko tokens for {len(params_list) - start} more request(s) for {wait:.1f}s, "
+                        f"returning {start}/{len(params_list)}")
+            break
+        if wait:
+            raise UpstreamRateLimited('coingecko', wait)
+
+        if HTTPX_AVAILABLE and len(batch) > 1 and not _in_event_loop():
+            results.extend(asyncio.run(_coingecko_gather(path, batch)))
+        else:
+            results.extend(coingecko_get(path, params, reserved=True) for params in batch)
+    return results
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+async def _coingecko_gather(path: str, params_list: List[Dict]) -> List:
+    api_key = getattr(settings, 'COINGECKO_API_KEY', '')
+    headers = {'Accept': 'application/json'}
+    if api_key:
+        headers['x-cg-demo-api-key'] = api_key
+    url = f"{COINGECKO_BASE_URL}/{path.lstrip('/')}"
+    limits = httpx.Limits(max_connections=len(params_list), max_keepalive_connections=len(params_list))
+    try:
+        async with httpx.AsyncClient(headers=headers, limits=limits, timeout=_timeout()) as client:
+            responses = await asyncio.gather(*(client.get(url, params=params) for params in params_list))
+            for response in responses:
+                logger.info(f"coingecko GET {response.url} -> {response.status_code}")
+                response.raise_for_status()
+            return [response.json() for response in responses]
+    # Re-raise as requests exceptions so adaptive_rate_limit_handler treats both clients alike
+    except httpx.HTTPStatusError as e:
+        raise requests.exceptions.HTTPError(str(e), response=e.response) from e
+    except httpx.TimeoutException as e:
+        raise requests.exceptions.Timeout(str(e)) from e
+    except httpx.TransportError as e:
+        raise requests.exceptions.ConnectionError(str(e)) from e
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def fetch_simple_prices(coin_ids: Iterable[str], vs_currency: str = 'usd') -> Dict[str, Dict]:
+    """Prices for many coins, SIMPLE_PRICE_BATCH_SIZE ids per upstream call.
+
+    One call prices at most a full token bucket of batches; coins past that
+    are left out, so callers list the ones they need most first and pick up
+    the rest on their next refresh.
+    """
+    coin_ids = list(dict.fromkeys(coin_id.lower() for coin_id in coin_ids if coin_id))
+    if not coin_ids:
+        return {}
+    batches = list(_chunks(coin_ids, SIMPLE_PRICE_BATCH_SIZE))
+    if len(batches) > (capacity := bucket_capacity('coingecko')):
+        logger.info(f"Pricing {capacity * SIMPLE_PRICE_BATCH_SIZE} of {len(coin_ids)} coins this round")
+        batches = batches[:capacity]
+    if wait := acquire_tokens('coingecko', len(batches)):
+        raise UpstreamRateLimited('coingecko', wait)
+
+    prices = {}
+    for batch in batches:
+        prices.update(coingecko_get('simple/price', {
+            'ids': ','.join(batch),
+            'vs_currencies': vs_currency,
+            'include_24hr_change': 'true',
+        }, reserved=True))
+    return prices
+
+# ------------------ NewsAPI ------------------
+
+def newsapi_get(path: str, params: Optional[Dict] = None):
+    """GET a NewsAPI endpoint through the pooled session and shared rate limit"""
+    api_key = getattr(settings, 'NEWSAPI_KEY', '')
+    headers = {'X-Api-Key': api_key} if api_key else {}
+    return _request('newsapi', f"{NEWSAPI_BASE_URL}/{path.lstrip('/')}", params, headers)
@@ -7,7 +7,7 @@ from .views import (
     watchlist, add_to_watchlist, alerts, add_alert, technical,
     custom_login, custom_logout, register, profile, settings,
     search, about, contact, terms, privacy, news, live_charts,
-    market_data_api, alerts_api, clear_cache
+    market_data_api, autocomplete_api, alerts_api, clear_cache
 )
 
 urlpatterns = [
@@ -57,6 +57,7 @@ urlpatterns = [
 
     # API endpoints
     path('api/market-data/', market_data_api, name='market_data_api'),
+    path('api/autocomplete/', autocomplete_api, name='autocomplete_api'),
 
     # Admin utilities
     path('clear-cache/', clear_cache, name='clear_cache'),
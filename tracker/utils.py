@@ -1,16 +1,25 @@
+import hashlib
+import importlib
 import logging
+import threading
 import time
-from typing import Dict, List, Optional, Union
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
 from functools import wraps
 from datetime import datetime, timedelta
 import json
 import os
 
 import requests
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.core.cache import cache
 from django.conf import settings
 from django.http import HttpResponseForbidden
 from dotenv import load_dotenv
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .snapshots import get_coin_sentiment, get_snapshot_age, read_snapshot
+from .upstream import UpstreamRateLimited, coingecko_get, coingecko_get_many, newsapi_get
 
 # Load .env keys
 load_dotenv()
@@ -22,14 +31,6 @@ NEWSAPI_KEY = getattr(settings, 'NEWSAPI_KEY', os.getenv("NEWSAPI_KEY"))
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Check for vaderSentiment
-try:
-    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-    VADER_AVAILABLE = True
-except ImportError:
-    VADER_AVAILABLE = False
-    logger.warning("vaderSentiment not installed. Sentiment analysis disabled.")
-
 # ------------------ Middleware ------------------
 
 class BlockWpAdminMiddleware:
@@ -43,61 +44,228 @@ class BlockWpAdminMiddleware:
             return HttpResponseForbidden("Access denied")
         return self.get_response(request)
 
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that can sit in an async middleware chain.
+
+    Stock WhiteNoise is sync-only, so under ASGI Django would run every
+    request through the single sync thread. Here non-static requests go
+    straight to the async handler and static files are served from the
+    thread pool.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
 # ------------------ Rate Limiting ------------------
 
-def adaptive_rate_limit_handler(max_retries: int = 3, base_delay: int = 60, backoff_multiplier: float = 2):
-    """Decorator for handling API rate limits with exponential backoff and caching"""
+# In-flight calls per decorated function and arguments, shared by all threads of this process
+_inflight_calls: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+def _call_key(func_name: str, args: tuple, kwargs: Dict) -> str:
+    """Stable key for one call, so calls with different arguments never share a flight or a cached result"""
+    if not args and not kwargs:
+        return func_name
+    payload = json.dumps([list(args), kwargs], sort_keys=True, default=repr)
+    return f"{func_name}:{hashlib.sha1(payload.encode()).hexdigest()[:16]}"
+
+def adaptive_rate_limit_handler(max_retries: int = 3, base_delay: int = 60, backoff_multiplier: float = 2,
+                                wait_timeout: float = 10, retry_task: Optional[str] = None):
+    """Decorator for handling API rate limits with single-flight coalescing and caching.
+
+    Concurrent callers with the same arguments share one upstream call:
+    threads in the same process wait on the in-flight future, other processes get stale-while-revalidate
+    data or wait (up to wait_timeout) for the lock holder's notification.
+    Rate limits and timeouts never sleep the caller; the caller gets cached
+    data and retry_task (the dotted path of the Celery task that owns the
+    fetch and publishes its result) is re-enqueued with the next attempt.
+
+    Callers that publish what they get (the ingestion tasks) pass
+    fallback=False: whenever no fresh upstream result is available they get
+    None instead of stale, cached or fallback data.
+    """
     def decorator(func):
         @wraps(func)
-        def wrapper(*args, **kwargs):
+        def wrapper(*args, _retry_attempt: int = 0, fallback: bool = True, **kwargs):
             func_name = func.__name__
-            lock_key = f"lock:{func_name}"
-            rate_limit_key = f"rate_limit:{func_name}"
+            call_key = _call_key(func_name, args, kwargs)
+            rate_limit_key = f"rate_limit:{func_name}"  # the upstream limit applies whatever the arguments
+            if _retry_attempt and retry_task:
+                cache.delete(f"retry_scheduled:{retry_task}")  # this is the scheduled retry running
 
             if rate_limit_until := cache.get(rate_limit_key):
                 if time.time() < rate_limit_until:
                     wait_time = rate_limit_until - time.time()
                     logger.warning(f"{func_name} rate limited for {wait_time:.1f}s")
-                    return _get_cached_data(func_name)
-
-            if cache.get(lock_key):
-                logger.info(f"Another instance of {func_name} is running")
-                time.sleep(2)
-                return _get_cached_data(func_name)
-
-            cache.set(lock_key, 1, timeout=120)
-            try:
-                for attempt in range(max_retries):
-                    try:
-                        result = func(*args, **kwargs)
-                        cache.delete(rate_limit_key)
-                        if result:
-                            cache.set(f"{func_name}_cache", result, timeout=7200)  # Cache for 2 hours
-                            cache.set(f"{func_name}_cache_timestamp", time.time(), timeout=7200)
-                        return result
-
-                    except requests.exceptions.HTTPError as e:
-                        wait_time = _handle_http_error(e, func_name, attempt, max_retries, base_delay, backoff_multiplier)
-                        if wait_time and attempt < max_retries - 1:
-                            time.sleep(wait_time)
-                            continue
-                        return _get_cached_data(func_name)
-
-                    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-                        logger.warning(f"{type(e).__name__} for {func_name} (attempt {attempt + 1}/{max_retries})")
-                        if attempt < max_retries - 1:
-                            time.sleep(base_delay * (backoff_multiplier ** attempt))
-                            continue
-                        return _get_cached_data(func_name)
-
-                    except Exception as e:
-                        logger.error(f"Unexpected error in {func_name}: {e}", exc_info=True)
-                        return _get_cached_data(func_name)
-            finally:
-                cache.delete(lock_key)
+                    return _get_cached_data(func_name, call_key) if fallback else None
+
+            with _inflight_lock:
+                future = _inflight_calls.get(call_key)
+                is_leader = future is None
+                if is_leader:
+                    future = Future()
+                    _inflight_calls[call_key] = future
+
+            if not is_leader:
+                logger.info(f"Joining in-flight {func_name} call")
+                try:
+                    result, fresh = future.result(timeout=wait_timeout)
+                except Exception:
+                    result, fresh = None, False
+            else:
+                try:
+                    result, fresh = _call_single_flight(func, call_key, args, kwargs, _retry_attempt, max_retries,
+                                                        base_delay, backoff_multiplier, wait_timeout, retry_task)
+                    future.set_result((result, fresh))
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                finally:
+                    with _inflight_lock:
+                        _inflight_calls.pop(call_key, None)
+
+            if fresh:
+                return result
+            if not fallback:
+                return None
+            return result or _get_cached_data(func_name, call_key)
         return wrapper
     return decorator
 
+def _call_single_flight(func, call_key: str, args, kwargs, attempt: int, max_retries: int, base_delay: int,
+                        backoff_multiplier: float, wait_timeout: float, retry_task: Optional[str]):
+    """Run func under the cross-process lock, or serve the current lock holder's result.
+
+    Returns (result, fresh). fresh is False when nothing new came from
+    upstream, with result then None or a stale copy of an earlier result.
+    """
+    func_name = func.__name__
+    lock_key = f"lock:{call_key}"
+
+    if not cache.add(lock_key, 1, timeout=120):
+        logger.info(f"Another instance of {func_name} is running")
+        started = time.time()
+        stale = cache.get(f"{call_key}_cache")
+        if stale:
+            return stale, False
+        if _wait_for_flight(call_key, wait_timeout) and (cache.get(f"{call_key}_cache_timestamp") or 0) >= started:
+            return cache.get(f"{call_key}_cache"), True
+        return None, False
+
+    try:
+        result = func(*args, **kwargs)
+        cache.delete(f"rate_limit:{func_name}")
+        if result:
+            cache.set(f"{call_key}_cache", result, timeout=7200)  # Cache for 2 hours
+            cache.set(f"{call_key}_cache_timestamp", time.time(), timeout=7200)
+        return result, True
+
+    except UpstreamRateLimited as e:
+        logger.warning(f"{func_name} deferred by shared rate limit for {e.retry_after:.1f}s")
+        cache.set(f"rate_limit:{func_name}", time.time() + e.retry_after, timeout=int(e.retry_after) + 60)
+        if attempt < max_retries - 1:
+            _schedule_retry(retry_task, func_name, attempt + 1, e.retry_after)
+        return None, False
+
+    except requests.exceptions.HTTPError as e:
+        wait_time = _handle_http_error(e, func_name, attempt, max_retries, base_delay, backoff_multiplier)
+        if wait_time and attempt < max_retries - 1:
+            _schedule_retry(retry_task, func_name, attempt + 1, wait_time)
+        return None, False
+
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        logger.warning(f"{type(e).__name__} for {func_name} (attempt {attempt + 1}/{max_retries})")
+        if attempt < max_retries - 1:
+            _schedule_retry(retry_task, func_name, attempt + 1, base_delay * (backoff_multiplier ** attempt))
+        return None, False
+
+    except Exception as e:
+        logger.error(f"Unexpected error in {func_name}: {e}", exc_info=True)
+        return None, False
+
+    finally:
+        cache.delete(lock_key)
+        _notify_flight_done(call_key)
+
+def _get_redis_connection():
+    """Raw Redis client behind the default cache, or None for non-Redis backends"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+def _wait_for_flight(call_key: str, timeout: float) -> bool:
+    """Block until the lock holder for call_key publishes completion; False on timeout"""
+    conn = _get_redis_connection()
+    if conn is None:
+        return False
+    pubsub = conn.pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(f"singleflight:{call_key}")
+        deadline = time.monotonic() + timeout
+        # The holder may have finished between our lock attempt and the subscribe
+        while cache.get(f"lock:{call_key}"):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if pubsub.get_message(timeout=min(remaining, 1.0)):
+                return True
+        return True
+    except Exception as e:
+        logger.warning(f"Waiting on in-flight {call_key} failed: {e}")
+        return False
+    finally:
+        pubsub.close()
+
+def _notify_flight_done(call_key: str) -> None:
+    """Wake up processes waiting on this call's result"""
+    conn = _get_redis_connection()
+    if conn is None:
+        return
+    try:
+        conn.publish(f"singleflight:{call_key}", 1)
+    except Exception as e:
+        logger.warning(f"Failed to notify waiters for {call_key}: {e}")
+
+def _schedule_retry(task_path: Optional[str], func_name: str, attempt: int, delay: float) -> None:
+    """Re-enqueue the task owning func_name's fetch after delay seconds instead of sleeping the caller.
+
+    The task fetches again with retry_attempt=attempt and publishes what it
+    gets, so a successful retry reaches the snapshot, registry or news store.
+    """
+    if not task_path or not cache.add(f"retry_scheduled:{task_path}", 1, timeout=int(delay) + 60):
+        return
+    module_name, task_name = task_path.rsplit('.', 1)
+    task = getattr(importlib.import_module(module_name), task_name)
+    countdown = delay + 1  # land just after the rate-limit window closes
+    logger.info(f"Rescheduling {task_name} for {func_name} in {countdown:.0f}s (attempt {attempt + 1})")
+
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        timer = threading.Timer(countdown, task, kwargs={'retry_attempt': attempt})
+        timer.daemon = True
+        timer.start()
+    else:
+        task.apply_async(kwargs={'retry_attempt': attempt}, countdown=countdown)
+
 def _handle_http_error(e: requests.exceptions.HTTPError, func_name: str, attempt: int,
                       max_retries: int, base_delay: int, backoff_multiplier: float) -> Optional[float]:
     """Handle HTTP errors with appropriate rate limiting logic"""
@@ -124,10 +292,11 @@ def _calculate_wait_time(retry_after: int, reset_time: Optional[str], base_delay
             pass
     return min(retry_after, base_delay * (backoff_multiplier ** attempt))
 
-def _get_cached_data(func_name: str) -> Optional[Dict]:
-    """Get cached data if available and fresh enough"""
-    cached_data = cache.get(f"{func_name}_cache")
-    cache_timestamp = cache.get(f"{func_name}_cache_timestamp")
+def _get_cached_data(func_name: str, call_key: Optional[str] = None) -> Optional[Dict]:
+    """Get cached data for this call if available and fresh enough"""
+    call_key = call_key or func_name
+    cached_data = cache.get(f"{call_key}_cache")
+    cache_timestamp = cache.get(f"{call_key}_cache_timestamp")
     if cached_data and cache_timestamp and (time.time() - cache_timestamp < 3600):
         logger.info(f"Using cached {func_name} data")
         return cached_data
@@ -149,175 +318,126 @@ def _get_fallback_data(func_name: str) -> Optional[Dict]:
             }
     elif func_name == 'fetch_news':
         return []
-    elif func_name == 'fetch_sentiment':
-        return {"score": 0.5, "label": "Neutral"}
-    elif func_name == 'fetch_valid_coins':
-        return ['bitcoin', 'ethereum', 'binancecoin', 'cardano', 'solana']
+    elif func_name == 'fetch_coin_list':
+        return [('bitcoin', 'btc', 'Bitcoin'), ('ethereum', 'eth', 'Ethereum'), ('binancecoin', 'bnb', 'BNB'),
+                ('cardano', 'ada', 'Cardano'), ('solana', 'sol', 'Solana')]
     return None
 
 # ------------------ Market Data ------------------
 
-@adaptive_rate_limit_handler(max_retries=3, base_delay=60)
-def fetch_market_data(diagnostic_mode: bool=False, min_coins: int=30) -> Optional[Dict]:
-    """Fetch real-time market data from CoinGecko Demo API"""
-    cached_data = cache.get('market_data')
-    cache_age = cache.get('market_data_timestamp')
-    if cached_data and cache_age and (time.time()-cache_age)<300 and len(cached_data)>=min_coins:
+MARKET_PAGE_SIZE = 250  # CoinGecko's per_page maximum for /coins/markets
+
+@adaptive_rate_limit_handler(max_retries=3, base_delay=60, retry_task='tracker.tasks.update_market_data')
+def fetch_market_data(diagnostic_mode: bool=False, min_coins: int=30, force_refresh: bool=False) -> Optional[Dict]:
+    """Fetch real-time market data from CoinGecko Demo API.
+
+    Only the ingestion task should call this; request handlers read the
+    published snapshot through tracker.snapshots.get_market_snapshot().
+    Upstream and parsing errors propagate to adaptive_rate_limit_handler,
+    which decides between a retry, cached data and fallback data.
+    """
+    _, cached_data = read_snapshot()
+    cache_age = get_snapshot_age()
+    if not force_refresh and cached_data and cache_age is not None and cache_age<300 and len(cached_data)>=min_coins:
         logger.info(f"Using cached market data ({len(cached_data)} coins)")
         return cached_data
 
+    coins = max(min_coins, settings.MARKET_DATA_COINS)
+    per_page = min(coins, MARKET_PAGE_SIZE)
+    pages = -(-coins // per_page)
     market_data = {}
-    page = 1
-    max_pages = 3
-    try:
-        while len(market_data) < min_coins and page <= max_pages:
-            url = "https://api.coingecko.com/api/v3/coins/markets"  # Demo API endpoint
-            headers = {'x-cg-demo-api-key': COINGECKO_API_KEY} if COINGECKO_API_KEY else {}
-            params = {
-                'vs_currency': 'usd',
-                'order': 'market_cap_desc',
-                'per_page': 50,
-                'page': page,
-                'sparkline': 'false',
-                'price_change_percentage': '1h,24h,7d'
-            }
-            logger.info(f"Fetching market data page {page}, URL: {url}, Headers: {headers}")
-            response = requests.get(url, headers=headers, params=params, timeout=30)
-            logger.info(f"Status: {response.status_code}, Headers: {response.headers}")
-            response.raise_for_status()
-            data = response.json()
-
-            skipped = []
-            for coin in data:
-                if 'id' not in coin or coin.get('current_price') is None:
-                    skipped.append(coin.get('id', 'unknown'))
-                    continue
-                market_data[coin['id']] = {
-                    "usd": float(coin['current_price']),
-                    "usd_24h_change": float(coin.get('price_change_percentage_24h', 0)),
-                    "volume_24h": float(coin.get('total_volume', 0)),
-                    "market_cap": float(coin.get('market_cap', 0)),
-                    "market_cap_rank": coin.get('market_cap_rank', 0),
-                    "symbol": coin.get('symbol', '').upper(),
-                    "name": coin.get('name', ''),
-                    "last_updated": coin.get('last_updated', ''),
-                    "sentiment": "Neutral"
-                }
-            page += 1
-            time.sleep(1)
-
-        # Save successful data to fallback file
-        if market_data:
-            try:
-                with open('fallback_market_data.json', 'w') as f:
-                    json.dump(market_data, f)
-                logger.info("Saved market data to fallback file")
-            except Exception as e:
-                logger.error(f"Failed to save fallback data: {e}")
-
-        cache.set('market_data', market_data, timeout=7200)  # Cache for 2 hours
-        cache.set('market_data_timestamp', time.time(), timeout=7200)
-        return market_data
-    except Exception as e:
-        logger.error(f"Error fetching market data: {e}, Response: {getattr(e.response, 'text', '')}, Headers: {getattr(e.response, 'headers', '')}", exc_info=True)
-        return cached_data if cached_data else _get_fallback_data('fetch_market_data')
+    coin_sentiment = get_coin_sentiment()
+    logger.info(f"Fetching top {coins} coins in {pages} concurrent page(s)")
+    responses = coingecko_get_many('coins/markets', [{
+        'vs_currency': 'usd',
+        'order': 'market_cap_desc',
+        'per_page': per_page,
+        'page': page,
+        'sparkline': 'false',
+        'price_change_percentage': '1h,24h,7d'
+    } for page in range(1, pages + 1)])
+
+    skipped = []
+    for coin in (coin for data in responses for coin in data):
+        if len(market_data) >= coins:
+            break
+        if 'id' not in coin or coin.get('current_price') is None:
+            skipped.append(coin.get('id', 'unknown'))
+            continue
+        market_data[coin['id']] = {
+            "usd": float(coin['current_price']),
+            "usd_24h_change": float(coin.get('price_change_percentage_24h') or 0),
+            "volume_24h": float(coin.get('total_volume') or 0),
+            "market_cap": float(coin.get('market_cap') or 0),
+            "market_cap_rank": coin.get('market_cap_rank', 0),
+            "symbol": coin.get('symbol', '').upper(),
+            "name": coin.get('name', ''),
+            "last_updated": coin.get('last_updated', ''),
+            "sentiment": coin_sentiment.get(coin['id'], "Neutral")
+        }
+    if len(responses) < pages and cached_data:
+        # Later pages ran out of tokens: keep their coins at the last published prices
+        logger.info(f"Fetched {len(responses)}/{pages} pages, keeping cached prices for the rest")
+        for coin_id, data in cached_data.items():
+            if len(market_data) >= coins:
+                break
+            market_data.setdefault(coin_id, data)
+
+    # Save successful data to fallback file
+    if market_data:
+        try:
+            with open('fallback_market_data.json', 'w') as f:
+                json.dump(market_data, f)
+            logger.info("Saved market data to fallback file")
+        except Exception as e:
+            logger.error(f"Failed to save fallback data: {e}")
 
-# ------------------ Valid Coins ------------------
+    return market_data
 
-@adaptive_rate_limit_handler(max_retries=2, base_delay=10)
-def fetch_valid_coins() -> List[str]:
-    """Fetch valid cryptocurrency IDs from CoinGecko Demo API"""
-    if valid_coins := cache.get('valid_coins'):
-        return valid_coins
-    try:
-        url = "https://api.coingecko.com/api/v3/coins/list"  # Demo API endpoint
-        headers = {'x-cg-demo-api-key': COINGECKO_API_KEY} if COINGECKO_API_KEY else {}
-        logger.info(f"Fetching valid coins, URL: {url}, Headers: {headers}")
-        response = requests.get(url, headers=headers, timeout=30)
-        logger.info(f"Status: {response.status_code}, Headers: {response.headers}")
-        response.raise_for_status()
-        valid_coins = [coin['id'].lower() for coin in response.json() if 'id' in coin]
-        cache.set('valid_coins', valid_coins, timeout=86400)
-        return valid_coins
-    except Exception as e:
-        logger.error(f"Error fetching valid coins: {e}, Response: {getattr(e.response, 'text', '')}, Headers: {getattr(e.response, 'headers', '')}", exc_info=True)
-        return ['bitcoin', 'ethereum', 'binancecoin', 'cardano', 'solana']
+# ------------------ Coin List ------------------
+
+@adaptive_rate_limit_handler(max_retries=2, base_delay=10, retry_task='tracker.tasks.refresh_coin_registry')
+def fetch_coin_list() -> List[Tuple[str, str, str]]:
+    """Fetch every CoinGecko coin as (id, symbol, name); consumed by tracker.coins"""
+    logger.info("Fetching coin list")
+    return [
+        (coin['id'].lower(), coin.get('symbol') or '', coin.get('name') or '')
+        for coin in coingecko_get('coins/list') if coin.get('id')
+    ]
 
 # ------------------ News & Sentiment ------------------
 
-def analyze_article_sentiment(text: str) -> Dict[str, Union[float, str]]:
-    if not VADER_AVAILABLE or not text or len(text.strip()) < 10:
-        return {"score": 0.5, "label": "Neutral"}
-    try:
-        analyzer = SentimentIntensityAnalyzer()
-        score = (analyzer.polarity_scores(text)['compound'] + 1) / 2
-        label = ("Very Positive" if score > 0.65 else "Positive" if score > 0.55 else "Neutral" if score > 0.45 else "Negative" if score > 0.35 else "Very Negative")
-        return {"score": round(score, 3), "label": label}
-    except Exception as e:
-        logger.error(f"Error analyzing sentiment: {e}", exc_info=True)
-        return {"score": 0.5, "label": "Neutral"}
-
-@adaptive_rate_limit_handler(max_retries=2, base_delay=10)
-def fetch_news() -> List[Dict]:
-    """Fetch cryptocurrency news from NewsAPI"""
-    cached_news = cache.get('crypto_news')
-    if cached_news and cache.get('crypto_news_timestamp') and (time.time() - cache.get('crypto_news_timestamp')) < 7200:
-        return cached_news
+NEWS_PAGE_SIZE = 100  # NewsAPI's pageSize maximum
+
+@adaptive_rate_limit_handler(max_retries=2, base_delay=10, retry_task='tracker.tasks.ingest_news')
+def fetch_news(pages: int = 1) -> List[Dict]:
+    """Fetch the latest cryptocurrency articles from NewsAPI, up to NEWS_PAGE_SIZE per page.
+
+    Returns raw NewsAPI articles. Only the news ingester (tracker.news) should
+    call this; request handlers read the stored NewsArticle rows.
+    """
     if not NEWSAPI_KEY:
         logger.warning("NewsAPI key not configured")
         return []
-    try:
-        response = requests.get(
-            "https://newsapi.org/v2/everything",
-            params={
+    articles = []
+    for page in range(1, pages + 1):
+        try:
+            batch = newsapi_get('everything', {
                 'q': 'cryptocurrency OR bitcoin OR ethereum',
-                'apiKey': NEWSAPI_KEY,
                 'language': 'en',
                 'sortBy': 'publishedAt',
-                'pageSize': 10,  # Reduced to avoid rate limits
+                'pageSize': NEWS_PAGE_SIZE,
+                'page': page,
                 'from': (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
-            },
-            timeout=30
-        )
-        logger.info(f"NewsAPI Status: {response.status_code}, Headers: {response.headers}")
-        response.raise_for_status()
-        articles = response.json().get('articles', [])
-        
-        processed_articles = []
-        for article in articles:
-            sentiment = analyze_article_sentiment(article.get('title', '') + ' ' + article.get('description', ''))
-            processed_articles.append({
-                'title': article.get('title'),
-                'description': article.get('description'),
-                'url': article.get('url'),
-                'publishedAt': article.get('publishedAt'),
-                'sentiment': sentiment
-            })
-        
-        cache.set('crypto_news', processed_articles, timeout=7200)  # Cache for 2 hours
-        cache.set('crypto_news_timestamp', time.time(), timeout=7200)
-        return processed_articles
-    except Exception as e:
-        logger.error(f"Error fetching news: {e}, Response: {getattr(e.response, 'text', '')}, Headers: {getattr(e.response, 'headers', '')}", exc_info=True)
-        return cached_news if cached_news else _get_fallback_data('fetch_news')
-
-@adaptive_rate_limit_handler(max_retries=2, base_delay=10)
-def fetch_sentiment() -> Dict[str, Union[float, str]]:
-    """Fetch overall market sentiment by analyzing recent news articles"""
-    try:
-        articles = fetch_news()
-        if not articles:
-            return _get_fallback_data('fetch_sentiment')
-        
-        total_score = sum(article['sentiment']['score'] for article in articles)
-        avg_score = total_score / len(articles)
-        
-        label = ("Very Positive" if avg_score > 0.65 else 
-                 "Positive" if avg_score > 0.55 else 
-                 "Neutral" if avg_score > 0.45 else 
-                 "Negative" if avg_score > 0.35 else "Very Negative")
-        
-        return {"score": round(avg_score, 3), "label": label}
-    except Exception as e:
-        logger.error(f"Error calculating sentiment: {e}", exc_info=True)
-        return _get_fallback_data('fetch_sentiment')
+            }).get('articles', [])
+        except Exception as e:
+            if page == 1:
+                raise
+            # Developer keys stop at 100 results (HTTP 426); keep the pages already fetched
+            logger.warning(f"News page {page} failed, keeping {len(articles)} articles: {e}")
+            break
+        articles.extend(batch)
+        if len(batch) < NEWS_PAGE_SIZE:
+            break
+    logger.info(f"Fetched {len(articles)} articles")
+    return articles
@@ -0,0 +1,121 @@
+import logging
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+
+from .models import Portfolio
+from .columnar import ColumnarSnapshot
+from .longtail import get_longtail_prices
+from .snapshots import get_columnar_snapshot, get_snapshot_version
+
+logger = logging.getLogger(__name__)
+
+VALUATION_CACHE_KEY = 'portfolio_valuation:{user_id}:{version}'
+
+class PortfolioValuation:
+    """One user's holdings as parallel arrays, valued against a price map.
+
+    Holdings are read from the database once; every total, per-asset value
+    and P/L figure comes from the same vectorized pass over those arrays.
+    """
+
+    def __init__(self, holdings: List[tuple], current_prices: np.ndarray, invested: Optional[Decimal] = None):
+        self.holdings = holdings  # (cryptocurrency, amount, purchase_price) as stored
+        self.coins = [coin for coin, _, _ in holdings]
+        self.amounts = np.array([float(amount) for _, amount, _ in holdings], dtype=np.float64)
+        self.purchase_prices = np.array([float(price) for _, _, price in holdings], dtype=np.float64)
+        self.costs = self.amounts * self.purchase_prices
+        self.invested = float(invested) if invested is not None else float(self.costs.sum())
+        self.current_prices = np.array(current_prices, dtype=np.float64)
+        self.stale_prices: List[str] = []  # coins priced from an out-of-date long-tail quote
+        self._revalue()
+
+    def reprice(self, price_map: Dict[str, float]) -> None:
+        """Update the prices of the coins in price_map and revalue, without touching the database"""
+        for index, coin in enumerate(self.coins):
+            if coin in price_map:
+                self.current_prices[index] = float(price_map[coin] or 0.0)
+        self._revalue()
+
+    def _revalue(self) -> None:
+        self.values = self.amounts * self.current_prices
+        self.profit_loss = self.values - self.costs
+        self.current_value = float(self.values.sum())
+
+    def __len__(self):
+        return len(self.coins)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.coins
+
+    @property
+    def missing_prices(self) -> List[str]:
+        """Held coins with no price in the map used for this valuation"""
+        return [coin for coin, price in zip(self.coins, self.current_prices) if not price]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "current_value": self.current_value,
+            "invested": self.invested,
+            "profit_loss": self.current_value - self.invested,
+        }
+
+    def rows(self) -> List[Dict]:
+        """Per-asset rows in the shape portfolio.html expects"""
+        stale = set(self.stale_prices)
+        return [{
+            "cryptocurrency": coin,
+            "amount": amount,
+            "purchase_price": purchase_price,
+            "current_price": float(current_price),
+            "value": float(value),
+            "profit_loss": float(profit_loss),
+            "price_stale": coin in stale,
+            "price_missing": not current_price,
+        } for (coin, amount, purchase_price), current_price, value, profit_loss
+            in zip(self.holdings, self.current_prices, self.values, self.profit_loss)]
+
+    def chart(self) -> Dict[str, List]:
+        """Allocation labels/values for the dashboard doughnut chart"""
+        return {
+            "labels": [coin.capitalize() for coin in self.coins],
+            "values": [round(float(value), 2) for value in self.values],
+        }
+
+def value_portfolio(user, snapshot: Optional[ColumnarSnapshot] = None) -> PortfolioValuation:
+    """Value a user's portfolio against the current (or a given) columnar market snapshot"""
+    snapshot = snapshot if snapshot is not None else get_columnar_snapshot()
+    holdings = Portfolio.objects.filter(user=user)
+    invested = holdings.aggregate(invested=Sum(F('amount') * F('purchase_price')))['invested']
+    holdings = list(holdings.order_by('id').values_list('cryptocurrency', 'amount', 'purchase_price'))
+    return PortfolioValuation(holdings, snapshot.prices(coin for coin, _, _ in holdings), invested or Decimal('0'))
+
+# ------------------ Cache ------------------
+
+def get_portfolio_valuation(user) -> PortfolioValuation:
+    """Cached valuation of a user's portfolio for the current snapshot version.
+
+    A new snapshot version changes the key, so the valuation is recomputed
+    lazily on the first read after each price tick; holding changes delete
+    the entry through the Portfolio signals. Coins outside the snapshot are
+    priced from the long-tail quote cache on every read, since those quotes
+    refresh independently of snapshot versions.
+    """
+    key = VALUATION_CACHE_KEY.format(user_id=user.pk, version=get_snapshot_version())
+    valuation = cache.get(key)
+    if valuation is None:
+        valuation = value_portfolio(user)
+        cache.set(key, valuation, timeout=settings.MARKET_DATA_REFRESH_INTERVAL * 2)
+    if valuation.missing_prices:
+        quotes = get_longtail_prices(valuation.missing_prices)
+        valuation.reprice({coin: quote["usd"] for coin, quote in quotes.items()})
+        valuation.stale_prices = [coin for coin, quote in quotes.items() if quote["stale"]]
+    return valuation
+
+def invalidate_portfolio_valuation(user_id: int) -> None:
+    cache.delete(VALUATION_CACHE_KEY.format(user_id=user_id, version=get_snapshot_version()))
@@ -4,31 +4,51 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.core.exceptions import ValidationError
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from django.core.cache import cache
+from django.utils.cache import patch_cache_control
 from django.views import View
+from asgiref.sync import sync_to_async
 from decimal import Decimal
-import requests
 import logging
 import time
-from .models import Portfolio, Watchlist, Alert, CryptoPrice
-from .utils import fetch_market_data, fetch_valid_coins, fetch_news, fetch_sentiment
+from .models import Portfolio, Watchlist, Alert, PriceRollup
+from .news import aget_coin_news, aget_recent_articles, get_coin_news, request_news_ingest
+from .coins import get_coin_registry, resolve_coin, validate_coin
+from .search import search_coins, suggest_coins
+from .snapshots import (
+    aget_market_api_body, aget_market_snapshot, get_columnar_snapshot, get_market_sentiment, get_market_snapshot,
+    get_snapshot_version, get_snapshot_view, seconds_until_refresh,
+)
+from .serialization import json_bytes
+from .timeseries import RAW_RESOLUTION, RESOLUTION_SECONDS, get_chart_data
+from .indicators import get_indicator_series
+from .localcache import local_cache
+from .longtail import aget_longtail_prices
+from .valuation import get_portfolio_valuation
 
 logger = logging.getLogger(__name__)
 
+async def _resolve_user(request):
+    """Load the user on the event loop so templates and context processors never query the DB from it"""
+    request.user = await request.auser()
+    return request.user
+
+def _format_home_rows(market_data, version):
+    return {
+        coin_id: {
+            'usd': data['usd'],
+            'usd_24h_change': data['usd_24h_change'],
+            'volume_24h': data['volume_24h'],
+            'sentiment': data.get('sentiment', 'Neutral'),
+            'name': ' '.join(word.capitalize() for word in coin_id.replace('_', ' ').split())
+        }
+        for coin_id, data in market_data.items()
+    }
+
 def home(request):
     try:
-        market_data = cache.get('market_data') or fetch_market_data() or {}
-        formatted_data = {}
-        for coin_id, data in market_data.items():
-            formatted_data[coin_id] = {
-                'usd': data['usd'],
-                'usd_24h_change': data['usd_24h_change'],
-                'volume_24h': data['volume_24h'],
-                'sentiment': data.get('sentiment', 'Neutral'),
-                'name': ' '.join(word.capitalize() for word in coin_id.replace('_', ' ').split())
-            }
-        cache.set('market_data', formatted_data, timeout=3600)  # Cache for 1 hour
+        formatted_data = get_snapshot_view('home_rows', _format_home_rows)
     except Exception as e:
         logger.error(f"Error in home view: {e}")
         formatted_data = {}
@@ -38,91 +58,37 @@ def home(request):
         "is_data_live": bool(formatted_data)
     })
 
+def _top_movers(market_data, version):
+    return [(coin_id, market_data[coin_id]) for coin_id in get_columnar_snapshot().top(5, by='usd_24h_change')
+            if coin_id in market_data]
+
 @login_required
 def dashboard(request):
-    market_data = cache.get('market_data') or fetch_market_data() or {}
-    cache.set('market_data', market_data, timeout=3600)
-    price_map = {coin: Decimal(str(data["usd"])) for coin, data in market_data.items()}
-
-    portfolio_qs = Portfolio.objects.filter(user=request.user)
-    portfolio_empty = not portfolio_qs.exists()
-
-    current_value = sum(p.amount * price_map.get(p.cryptocurrency, Decimal('0.0')) for p in portfolio_qs)
-    invested = sum(p.amount * p.purchase_price for p in portfolio_qs)
-    profit_loss = current_value - invested
-
-    summary_data = {
-        "current_value": current_value,
-        "invested": invested,
-        "profit_loss": profit_loss
-    }
-
-    price_history = CryptoPrice.objects.order_by("-timestamp")[:50]
-    chart_data = {
-        "labels": [p.timestamp.strftime("%Y-%m-%d %H:%M") for p in price_history],
-        "values": [float(p.price_usd) for p in price_history]
-    }
-
-    portfolio_labels = [p.cryptocurrency.capitalize() for p in portfolio_qs]
-    portfolio_values = [float(p.amount * price_map.get(p.cryptocurrency, Decimal('0.0'))) for p in portfolio_qs]
+    market_data = get_market_snapshot()
+    valuation = get_portfolio_valuation(request.user)
+    allocation = valuation.chart()
+    chart_data = get_chart_data(request.GET.get("coin", "bitcoin").lower(), "1h")
 
     return render(request, "dashboard.html", {
         "market_data": market_data,
-        "summary_data": summary_data,
+        "top_movers": get_snapshot_view('top_movers', _top_movers),
+        "summary_data": valuation.summary(),
         "chart_data": chart_data,
-        "portfolio_labels": portfolio_labels,
-        "portfolio_values": portfolio_values,
-        "portfolio_empty": portfolio_empty,
+        "portfolio_labels": allocation["labels"],
+        "portfolio_values": allocation["values"],
+        "portfolio_empty": valuation.is_empty,
         "is_data_live": bool(market_data)
     })
 
 @login_required
 def portfolio(request):
-    market_data = cache.get('market_data') or fetch_market_data() or {}
-    cache.set('market_data', market_data, timeout=3600)
-    price_map = {coin: Decimal(str(data["usd"])) for coin, data in market_data.items()}
-
-    portfolio_qs = Portfolio.objects.filter(user=request.user)
-    # Batch fetch prices for coins not in top 50
-    missing_coins = [p.cryptocurrency for p in portfolio_qs if p.cryptocurrency not in price_map]
-    if missing_coins:
-        for attempt in range(3):
-            try:
-                coin_ids = ','.join(missing_coins)
-                response = requests.get(
-                    f"https://api.coingecko.com/api/v3/simple/price?ids={coin_ids}&vs_currencies=usd"
-                )
-                response.raise_for_status()
-                data = response.json()
-                for coin in missing_coins:
-                    price = data.get(coin, {}).get('usd', 0.0)
-                    price_map[coin] = Decimal(str(price))
-                logger.info(f"Fetched prices for {len(missing_coins)} missing coins: {missing_coins}")
-                break
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:
-                    wait_time = 2 ** attempt * 10
-                    logger.warning(f"Rate limit hit for batch price fetch. Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    logger.error(f"Error fetching batch prices: {e}")
-                    break
-            except requests.RequestException as e:
-                logger.error(f"Error fetching batch prices: {e}")
-                break
-
-    portfolio_data = [{
-        "cryptocurrency": p.cryptocurrency,
-        "amount": p.amount,
-        "purchase_price": p.purchase_price,
-        "current_price": price_map.get(p.cryptocurrency, Decimal('0.0')),
-        "profit_loss": (price_map.get(p.cryptocurrency, Decimal('0.0')) * p.amount) -
-                       (p.purchase_price * p.amount)
-    } for p in portfolio_qs]
-
+    # Coins outside the snapshot are priced from the long-tail cache the ingester refreshes
+    valuation = get_portfolio_valuation(request.user)
+    portfolio_data = valuation.rows()
     return render(request, "portfolio.html", {
         "portfolio": portfolio_data,
-        "edit_item": None
+        "edit_item": None,
+        "ticker_coins": valuation.coins
     })
 
 @login_required
@@ -139,19 +105,14 @@ def add_to_portfolio(request):
             purchase_price = Decimal(purchase_price)
             if amount <= 0 or purchase_price <= 0:
                 raise ValidationError("Amount and purchase price must be positive.")
-            valid_coins = fetch_valid_coins()
-            if not valid_coins:
-                logger.warning("Valid coins list empty, skipping validation")
-            elif cryptocurrency.lower() not in valid_coins:
-                logger.info(f"Invalid cryptocurrency: {cryptocurrency.lower()} not in {valid_coins[:10]}...")
-                raise ValidationError("Invalid cryptocurrency.")
+            cryptocurrency = validate_coin(cryptocurrency)
         except (ValidationError, ValueError) as e:
             messages.error(request, str(e))
             return redirect("portfolio")
 
         Portfolio.objects.create(
             user=request.user,
-            cryptocurrency=cryptocurrency.lower(),
+            cryptocurrency=cryptocurrency,
             amount=amount,
             purchase_price=purchase_price
         )
@@ -185,22 +146,11 @@ def edit_asset(request, cryptocurrency):
         messages.success(request, f"Updated {cryptocurrency} in portfolio")
         return redirect("portfolio")
 
-    market_data = cache.get('market_data') or fetch_market_data() or {}
-    cache.set('market_data', market_data, timeout=3600)
-    price_map = {coin: Decimal(str(data["usd"])) for coin, data in market_data.items()}
-    portfolio_qs = Portfolio.objects.filter(user=request.user)
-    portfolio_data = [{
-        "cryptocurrency": p.cryptocurrency,
-        "amount": p.amount,
-        "purchase_price": p.purchase_price,
-        "current_price": price_map.get(p.cryptocurrency, Decimal('0.0')),
-        "profit_loss": (price_map.get(p.cryptocurrency, Decimal('0.0')) * p.amount) -
-                       (p.purchase_price * p.amount)
-    } for p in portfolio_qs]
-
+    valuation = get_portfolio_valuation(request.user)
     return render(request, "portfolio.html", {
-        "portfolio": portfolio_data,
-        "edit_item": portfolio_item
+        "portfolio": valuation.rows(),
+        "edit_item": portfolio_item,
+        "ticker_coins": valuation.coins
     })
 
 @login_required
@@ -213,37 +163,43 @@ def remove_asset(request, cryptocurrency):
     return redirect("portfolio")
 
 @login_required
-def watchlist(request):
-    market_data = cache.get('market_data') or fetch_market_data() or {}
-    cache.set('market_data', market_data, timeout=3600)
-    price_map = {coin: Decimal(str(data["usd"])) for coin, data in market_data.items()}
-    watchlist_qs = Watchlist.objects.filter(user=request.user)
+async def watchlist(request):
+    user = await _resolve_user(request)
+    market_data = await aget_market_snapshot()
+    coins = [w.cryptocurrency async for w in Watchlist.objects.filter(user=user)]
+    quotes = await aget_longtail_prices([coin for coin in coins if coin not in market_data])
+    quotes.update((coin, market_data[coin]) for coin in coins if coin in market_data)
     watchlist_data = [{
-        "cryptocurrency": w.cryptocurrency,
-        "current_price": price_map.get(w.cryptocurrency, Decimal('0.0'))
-    } for w in watchlist_qs]
-    return render(request, "watchlist.html", {"watchlist": watchlist_data})
+        "cryptocurrency": coin,
+        "current_price": Decimal(str(quotes[coin]["usd"])) if coin in quotes else Decimal('0.0'),
+        "usd_24h_change": quotes[coin]["usd_24h_change"] if coin in quotes else None,
+        "price_stale": quotes.get(coin, {}).get("stale", False),
+        "price_missing": coin not in quotes,
+    } for coin in coins]
+    watched = {w["cryptocurrency"] for w in watchlist_data}
+    watchlist_news = [
+        {"article": article, "coins": [coin for coin in article.coins if coin in watched]}
+        for article in await aget_coin_news(watched)
+    ]
+    return render(request, "watchlist.html", {
+        "watchlist": watchlist_data,
+        "watchlist_news": watchlist_news,
+        "ticker_coins": [w["cryptocurrency"] for w in watchlist_data]
+    })
 
 @login_required
 def add_to_watchlist(request):
     if request.method == "POST":
         cryptocurrency = request.POST.get("cryptocurrency")
         try:
-            if not cryptocurrency:
-                raise ValidationError("Cryptocurrency is required.")
-            valid_coins = fetch_valid_coins()
-            if not valid_coins:
-                logger.warning("Valid coins list empty, skipping validation")
-            elif cryptocurrency.lower() not in valid_coins:
-                logger.info(f"Invalid cryptocurrency for watchlist: {cryptocurrency.lower()}")
-                raise ValidationError("Invalid cryptocurrency.")
+            cryptocurrency = validate_coin(cryptocurrency)
         except ValidationError as e:
             messages.error(request, str(e))
             return redirect("watchlist")
 
         Watchlist.objects.create(
             user=request.user,
-            cryptocurrency=cryptocurrency.lower()
+            cryptocurrency=cryptocurrency
         )
         messages.success(request, f"Added {cryptocurrency} to watchlist")
         return redirect("watchlist")
@@ -268,12 +224,7 @@ def add_alert(request):
             target_price = Decimal(target_price)
             if target_price <= 0:
                 raise ValidationError("Target price must be positive.")
-            valid_coins = fetch_valid_coins()
-            if not valid_coins:
-                logger.warning("Valid coins list empty, skipping validation")
-            elif cryptocurrency.lower() not in valid_coins:
-                logger.info(f"Invalid cryptocurrency for alert: {cryptocurrency.lower()}")
-                raise ValidationError("Invalid cryptocurrency.")
+            cryptocurrency = validate_coin(cryptocurrency)
             if condition not in ["above", "below"]:
                 raise ValidationError("Invalid condition.")
         except (ValidationError, ValueError) as e:
@@ -282,7 +233,7 @@ def add_alert(request):
 
         Alert.objects.create(
             user=request.user,
-            cryptocurrency=cryptocurrency.lower(),
+            cryptocurrency=cryptocurrency,
             target_price=target_price,
             condition=condition
         )
@@ -293,12 +244,26 @@ def add_alert(request):
 
 @login_required
 def technical(request):
-    price_history = CryptoPrice.objects.order_by("-timestamp")[:50]
-    chart_data = {
-        "labels": [p.timestamp.strftime("%Y-%m-%d %H:%M") for p in price_history],
-        "values": [float(p.price_usd) for p in price_history]
-    }
-    return render(request, "technical.html", {"chart_data": chart_data})
+    coin = resolve_coin(request.GET.get("coin", "bitcoin"))
+    if coin is None:
+        messages.error(request, "Invalid cryptocurrency.")
+        coin = "bitcoin"
+    resolution = request.GET.get("resolution", "1h")
+    if resolution not in RESOLUTION_SECONDS and resolution != RAW_RESOLUTION:
+        resolution = "1h"
+    try:
+        window = min(max(int(request.GET.get("window", 14)), 2), 200)
+    except ValueError:
+        window = 14
+    chart_data = get_indicator_series(coin, resolution, window).to_chart()
+    return render(request, "technical.html", {
+        "chart_data": chart_data,
+        "coin": coin,
+        "resolution": resolution,
+        "window": window,
+        "resolutions": PriceRollup.RESOLUTION_CHOICES + [(RAW_RESOLUTION, "Raw ticks")],
+        "coin_news": get_coin_news([coin]),
+    })
 
 def custom_login(request):
     if request.method == "POST":
@@ -335,9 +300,11 @@ def settings(request):
 
 def search(request):
     query = request.GET.get('q', '')
-    market_data = cache.get('market_data') or fetch_market_data() or {}
-    cache.set('market_data', market_data, timeout=3600)
-    results = {k: v for k, v in market_data.items() if query.lower() in k.lower()}
+    market_data = get_market_snapshot()
+    results = {
+        coin: market_data.get(coin, {"usd": 0.0, "usd_24h_change": 0.0, "volume_24h": 0.0, "sentiment": "Neutral"})
+        for coin in search_coins(query, limit=50)
+    }
     return render(request, 'search.html', {'query': query, 'results': results})
 
 def about(request):
@@ -352,61 +319,89 @@ def terms(request):
 def privacy(request):
     return render(request, 'privacy.html')
 
-def news(request):
-    try:
-        news_data = fetch_news() or []
-    except Exception:
-        news_data = []
-        messages.error(request, "Failed to fetch news. Please try again later.")
+async def news(request):
+    await _resolve_user(request)
+    await sync_to_async(request_news_ingest, thread_sensitive=False)()
+    news_data = await aget_recent_articles()
     return render(request, "news.html", {"news_data": news_data})
 
-def live_charts(request):
-    market_data = cache.get('market_data') or fetch_market_data() or {}
-    cache.set('market_data', market_data, timeout=3600)
+async def live_charts(request):
+    await _resolve_user(request)
+    market_data = await aget_market_snapshot()
     return render(request, "live_charts.html", {"market_data": market_data})
 
-def market_data_api(request):
+def _market_search_body(query):
     try:
-        market_data = cache.get('market_data') or fetch_market_data() or {}
-        query = request.GET.get('search', '').lower()
-        if query:
-            valid_coins = fetch_valid_coins()
-            if not valid_coins:
-                logger.warning("Valid coins list empty, returning empty market data")
-                market_data = {}
-            else:
-                filtered_coins = [coin for coin in valid_coins if query in coin]
-                market_data = {
-                    coin: market_data.get(coin, {"usd": 0.0, "usd_24h_change": 0.0, "volume_24h": 0.0, "sentiment": "Neutral"})
-                    for coin in filtered_coins[:50]
-                }
-        cache.set('market_data', market_data, timeout=3600)
-        sentiment_data = fetch_sentiment() or {"score": 0.5, "label": "Neutral"}
-        response = {
-            "market_data": market_data,
-            "sentiment": sentiment_data
-        }
+        market_data = get_market_snapshot()
+        return json_bytes({
+            "market_data": {
+                coin: market_data.get(coin, {"usd": 0.0, "usd_24h_change": 0.0, "volume_24h": 0.0, "sentiment": "Neutral"})
+                for coin in search_coins(query, limit=50)
+            },
+            "sentiment": get_market_sentiment(),
+        })
     except Exception as e:
         logger.error(f"Error in market_data_api: {e}")
-        response = {"market_data": {}, "sentiment": {"score": 0.5, "label": "Neutral"}}
-    return JsonResponse(response)
+        return json_bytes({"market_data": {}, "sentiment": {"score": 0.5, "label": "Neutral"}})
+
+async def market_data_api(request):
+    query = request.GET.get('search', '').lower()
+    if query:
+        body = await sync_to_async(_market_search_body, thread_sensitive=False)(query)
+        return HttpResponse(body, content_type="application/json")
+
+    # Unfiltered responses are materialized by the ingester; serve the stored bytes or a 304
+    await aget_market_snapshot()  # schedules a refresh if the snapshot is missing or stale
+    etag, published_at, body = await aget_market_api_body()
+    etag = f'"{etag}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response['ETag'] = etag
+    # Cacheable until the next scheduled refresh is due
+    patch_cache_control(response, public=True, max_age=seconds_until_refresh(published_at))
+    return response
+
+AUTOCOMPLETE_MAX_QUERY = 50
+AUTOCOMPLETE_CACHE_TIMEOUT = 600
+
+def autocomplete_api(request):
+    """Typeahead matches for a coin prefix, cached per normalized query and snapshot/registry version"""
+    query = ' '.join(request.GET.get('q', '').lower().split())[:AUTOCOMPLETE_MAX_QUERY]
+    version = f"{get_coin_registry().version}.{get_snapshot_version()}"
+    etag = f'"{version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        cache_key = f"autocomplete:{version}:{query}"
+        body = cache.get(cache_key)
+        if body is None:
+            body = json_bytes({"query": query, "results": suggest_coins(query) if query else []})
+            cache.set(cache_key, body, timeout=AUTOCOMPLETE_CACHE_TIMEOUT)
+        response = HttpResponse(body, content_type="application/json")
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=60)
+    return response
 
 @login_required
-def alerts_api(request):
+async def alerts_api(request):
     try:
-        alerts_qs = Alert.objects.filter(user=request.user)
+        user = await request.auser()
         alerts_data = [{
+            "id": alert.id,
             "cryptocurrency": alert.cryptocurrency,
             "target_price": float(alert.target_price),
             "condition": alert.condition,
-            "created_at": alert.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        } for alert in alerts_qs]
+            "is_active": alert.is_active,
+        } async for alert in Alert.objects.filter(user=user)]
         return JsonResponse({"alerts": alerts_data})
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
 def clear_cache(request):
     cache.clear()
+    local_cache.clear()
 
     messages.success(request, "Cache cleared successfully!")
     return redirect("home")